@@ -1,12 +1,21 @@
+from .breaker import CircuitBreaker
+from .cache import LRUCache, PlaintextCache
 from .cli import VaultCLI
 from .client import Vault
-from .exceptions import LoginError, MountError
+from .exceptions import CircuitOpen, LoginError, MountError
+from .exceptions import RequestTimeout
+from .limiter import Limiter
 from .objects import Health, HighAvailibility, SealStatus, Status
 from .objects import Initial, Value
 from .policy import Rules
+from .retry import RetryPolicy
+from .timeout import Timeout
 from .token import ReadToken, LoginToken
+from .transport import Transport
 
-__all__ = ['Health', 'HighAvailibility', 'Initial', 'LoginError',
-           'LoginToken', 'MountError', 'Rules', 'ReadToken',
-           'SealStatus', 'Status', 'Value', 'Vault', 'VaultCLI']
+__all__ = ['CircuitBreaker', 'CircuitOpen', 'Health', 'HighAvailibility',
+           'Initial', 'Limiter', 'LoginError', 'LoginToken', 'LRUCache',
+           'MountError', 'PlaintextCache', 'Rules', 'ReadToken',
+           'RequestTimeout', 'RetryPolicy', 'SealStatus', 'Status', 'Timeout',
+           'Transport', 'Value', 'Vault', 'VaultCLI']
 __version__ = '0.2.0rc1'
@@ -0,0 +1,488 @@
+import asyncio
+from collections import OrderedDict, deque, namedtuple
+
+__all__ = ['Keys', 'Ordered', 'Outcome', 'Results', 'Stream', 'Walk',
+           'pipeline', 'run_many']
+
+#: the outcome of a single call. error is set when the call failed
+Outcome = namedtuple('Outcome', 'key value error')
+
+#: tells the stream that a worker is done
+DONE = object()
+
+#: tells that a source is exhausted
+END = object()
+
+
+def puller(items):
+    """Returns a coroutine that pulls the next item, or END.
+
+    Parameters:
+        items (obj): An iterable, an async iterator, or a coroutine
+                     function that returns None once exhausted
+    """
+    if callable(items):
+        @asyncio.coroutine
+        def pull():
+            item = yield from items()
+            return END if item is None else item
+    elif hasattr(items, '__aiter__') or hasattr(items, '__anext__'):
+        if hasattr(items, '__aiter__'):
+            items = items.__aiter__()
+
+        @asyncio.coroutine
+        def pull():
+            try:
+                awaitable = items.__anext__()
+                if hasattr(awaitable, '__await__'):
+                    awaitable = awaitable.__await__()
+                item = yield from awaitable
+            except StopAsyncIteration:  # noqa
+                return END
+            return item
+    else:
+        iterator = iter(items)
+
+        @asyncio.coroutine
+        def pull():
+            return next(iterator, END)
+    return pull
+
+
+@asyncio.coroutine
+def call(func, key):
+    """Calls func with key, and returns its Outcome"""
+    try:
+        value = yield from func(key)
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        return Outcome(key, None, error)
+    return Outcome(key, value, None)
+
+
+class Results(OrderedDict):
+    """Maps the keys to their values, in the order they were added.
+
+    Attributes:
+        errors (OrderedDict): Maps the failed keys to their exception
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.errors = OrderedDict()
+
+    def __repr__(self):
+        return '<Results(values=%r, errors=%r)>' % (
+            len(self), len(self.errors))
+
+
+class Stream:
+    """Runs a coroutine for each key, with bounded parallelism.
+
+    Outcomes are yielded as they complete, not in the order of the keys.
+    Keys are consumed lazily, and at most ``concurrency`` outcomes are
+    buffered, so that slow consumers slow down the calls::
+
+        stream = Stream(store.read, keys, concurrency=10)
+        while True:
+            outcome = yield from stream.next()
+            if outcome is None:
+                break
+            print(outcome.key, outcome.value, outcome.error)
+
+    Under python >= 3.5, ``async for outcome in stream`` works too.
+
+    Parameters:
+        func (coroutine): Called with each key
+        keys (iterable): The keys
+        concurrency (int): The maximum number of calls in flight
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, func, keys, *, concurrency=10, loop=None):
+        self.func = func
+        self.keys = iter(keys)
+        self.concurrency = max(1, concurrency)
+        self.loop = loop or asyncio.get_event_loop()
+        self.queue = asyncio.Queue(self.concurrency, loop=self.loop)
+        self.workers = []
+        self.running = 0
+        self.error = None
+
+    def start(self):
+        if not self.workers:
+            for _ in range(self.concurrency):
+                worker = asyncio.async(self.work(), loop=self.loop)
+                self.workers.append(worker)
+            self.running = len(self.workers)
+
+    @asyncio.coroutine
+    def work(self):
+        try:
+            for key in self.keys:
+                outcome = yield from call(self.func, key)
+                yield from self.queue.put(outcome)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            # the keys themselves failed
+            self.error = error
+        yield from self.queue.put(DONE)
+
+    @asyncio.coroutine
+    def next(self):
+        """Returns the next outcome, or None once all keys are done
+
+        Returns:
+            Outcome
+        """
+        self.start()
+        while self.running:
+            outcome = yield from self.queue.get()
+            if outcome is not DONE:
+                return outcome
+            self.running -= 1
+        if self.error is not None:
+            raise self.error
+        return None
+
+    def close(self):
+        """Cancels the pending calls"""
+        for worker in self.workers:
+            worker.cancel()
+        self.running = 0
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        outcome = yield from self.next()
+        if outcome is None:
+            raise StopAsyncIteration  # noqa
+        return outcome
+
+    def __repr__(self):
+        return '<Stream(func=%r, concurrency=%r)>' % (
+            self.func, self.concurrency)
+
+
+class Walk:
+    """Walks a tree of keys, with bounded parallelism.
+
+    Up to ``concurrency`` directories are listed at once, and yielded as
+    they arrive::
+
+        walk = Walk(store.list, 'apps/', concurrency=10)
+        while True:
+            entry = yield from walk.next()
+            if entry is None:
+                break
+            path, keys = entry
+
+    Under python >= 3.5, ``async for path, keys in walk`` works too.
+    The directories left to list are kept on a stack, and the deepest
+    ones are listed first. Memory is then bounded by the depth of the
+    tree times its fan-out, instead of the width of its widest level.
+    Directories that vanish while walking are skipped, any other error
+    stops the walk.
+
+    Parameters:
+        func (coroutine): Lists a directory. The returned keys that end
+                          with a slash are sub-directories
+        prefix (str): The directory to start with
+        concurrency (int): The maximum number of listings in flight
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, func, prefix='', *, concurrency=10, loop=None):
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        self.func = func
+        self.prefix = prefix
+        self.concurrency = max(1, concurrency)
+        self.loop = loop
+        self.pending = [prefix]
+        self.running = set()
+
+    @asyncio.coroutine
+    def next(self):
+        """Returns the next directory, or None once the tree is walked
+
+        Returns:
+            tuple: The directory path and its keys
+        """
+        while True:
+            while self.pending and len(self.running) < self.concurrency:
+                task = asyncio.async(call(self.func, self.pending.pop()),
+                                     loop=self.loop)
+                self.running.add(task)
+            if not self.running:
+                return None
+            done, _ = yield from asyncio.wait(
+                self.running, loop=self.loop,
+                return_when=asyncio.FIRST_COMPLETED)
+            task = done.pop()
+            self.running.discard(task)
+            outcome = task.result()
+            if isinstance(outcome.error, KeyError):
+                continue
+            if outcome.error is not None:
+                self.close()
+                raise outcome.error
+            path, keys = outcome.key, outcome.value
+            # reversed, so that they are listed in order
+            self.pending.extend(reversed([path + key for key in keys
+                                          if key.endswith('/')]))
+            return path, keys
+
+    def close(self):
+        """Cancels the pending listings"""
+        for task in self.running:
+            task.cancel()
+        self.running, self.pending = set(), []
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        entry = yield from self.next()
+        if entry is None:
+            raise StopAsyncIteration  # noqa
+        return entry
+
+    def __repr__(self):
+        return '<Walk(prefix=%r, concurrency=%r)>' % (
+            self.prefix, self.concurrency)
+
+
+class Keys:
+    """Iterates over the keys of a tree, in lexicographic order.
+
+    Directories are listed one at a time, depth-first, so that only the
+    listings of the current branch are kept in memory. Because the order
+    is stable, an iteration can be resumed after the last key seen::
+
+        keys = Keys(store.list, 'apps/', after='apps/foo/bar')
+        while True:
+            key = yield from keys.next()
+            if key is None:
+                break
+
+    Parameters:
+        func (coroutine): Lists a directory. The returned keys that end
+                          with a slash are sub-directories
+        prefix (str): The directory to start with
+        after (str): Only the keys that sort after this one are returned
+        exclude (callable): Receives each key and directory, returns True
+                            to leave it out
+    """
+
+    def __init__(self, func, prefix='', *, after=None, exclude=None):
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        self.func = func
+        self.prefix = prefix
+        self.after = after
+        self.exclude = exclude
+        self.stack = None
+
+    def skip(self, path):
+        if self.exclude and self.exclude(path):
+            return True
+        if self.after is None:
+            return False
+        if path.endswith('/'):
+            # a directory is skipped when all its keys sort before after
+            return path < self.after and not self.after.startswith(path)
+        return path <= self.after
+
+    @asyncio.coroutine
+    def expand(self, path):
+        try:
+            keys = yield from self.func(path)
+        except KeyError:
+            keys = []
+        children = [path + key for key in sorted(keys)]
+        self.stack.append(deque(child for child in children
+                                if not self.skip(child)))
+
+    @asyncio.coroutine
+    def next(self):
+        """Returns the next key, or None once the tree is walked
+
+        Returns:
+            str
+        """
+        if self.stack is None:
+            self.stack = []
+            yield from self.expand(self.prefix)
+        while self.stack:
+            if not self.stack[-1]:
+                self.stack.pop()
+                continue
+            path = self.stack[-1].popleft()
+            if path.endswith('/'):
+                yield from self.expand(path)
+                continue
+            return path
+        return None
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        key = yield from self.next()
+        if key is None:
+            raise StopAsyncIteration  # noqa
+        return key
+
+    def __repr__(self):
+        return '<Keys(prefix=%r, after=%r)>' % (self.prefix, self.after)
+
+
+class Ordered:
+    """Runs a coroutine for each item, and yields the outcomes in order.
+
+    Up to ``concurrency`` calls are in flight, but an outcome is only
+    yielded once all the previous ones are. Items are pulled only when
+    there is room for them, so that memory stays bounded whatever the
+    number of items, and a slow consumer slows down the source::
+
+        stream = Ordered(transit.encrypt, rows, concurrency=10)
+        while True:
+            outcome = yield from stream.next()
+            if outcome is None:
+                break
+
+    Under python >= 3.5, ``async for outcome in stream`` works too.
+
+    Parameters:
+        func (coroutine): Called with each item
+        items (obj): An iterable, an async iterator, or a coroutine
+                     function that returns None once exhausted
+        concurrency (int): The maximum number of calls in flight
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, func, items, *, concurrency=10, loop=None):
+        self.func = func
+        self.pull = puller(items)
+        self.concurrency = max(1, concurrency)
+        self.loop = loop or asyncio.get_event_loop()
+        self.window = deque()
+        self.exhausted = False
+
+    @asyncio.coroutine
+    def next(self):
+        """Returns the next outcome, or None once all items are done
+
+        Returns:
+            Outcome
+        """
+        while not self.exhausted and len(self.window) < self.concurrency:
+            item = yield from self.pull()
+            if item is END:
+                self.exhausted = True
+            else:
+                task = asyncio.async(call(self.func, item), loop=self.loop)
+                self.window.append(task)
+        if not self.window:
+            return None
+        task = self.window.popleft()
+        try:
+            outcome = yield from task
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        return outcome
+
+    def close(self):
+        """Cancels the pending calls"""
+        while self.window:
+            self.window.popleft().cancel()
+        self.exhausted = True
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        outcome = yield from self.next()
+        if outcome is None:
+            raise StopAsyncIteration  # noqa
+        return outcome
+
+    def __repr__(self):
+        return '<Ordered(func=%r, concurrency=%r)>' % (
+            self.func, self.concurrency)
+
+
+@asyncio.coroutine
+def pipeline(items, func, sink, *, concurrency=10, loop=None):
+    """Runs func over items, in order, with bounded parallelism.
+
+    The results are handed to the sink in the order of the items, and the
+    first failure stops the pipeline. See :class:`Ordered`.
+
+    Parameters:
+        items (obj): An iterable, an async iterator, or a coroutine
+                     function that returns None once exhausted
+        func (coroutine): Called with each item
+        sink (callable): Called with each item and its result
+        concurrency (int): The maximum number of calls in flight
+        loop (EventLoop): The event loop
+    Returns:
+        int: The number of items
+    """
+    stream = Ordered(func, items, concurrency=concurrency, loop=loop)
+    count = 0
+    try:
+        while True:
+            outcome = yield from stream.next()
+            if outcome is None:
+                return count
+            if outcome.error is not None:
+                raise outcome.error
+            sink(outcome.key, outcome.value)
+            count += 1
+    finally:
+        stream.close()
+
+
+@asyncio.coroutine
+def run_many(func, keys, *, concurrency=10, loop=None):
+    """Runs func for each key, with bounded parallelism.
+
+    A failure does not stop the other calls.
+
+    Parameters:
+        func (coroutine): Called with each key
+        keys (iterable): The keys
+        concurrency (int): The maximum number of calls in flight
+        loop (EventLoop): The event loop
+    Returns:
+        Results: The values and the errors, by key. Values are
+                 in the order of the keys
+    """
+    keys = list(keys)
+    stream = Stream(func, keys, concurrency=concurrency, loop=loop)
+    values, errors = {}, {}
+    try:
+        while True:
+            outcome = yield from stream.next()
+            if outcome is None:
+                break
+            if outcome.error is None:
+                values[outcome.key] = outcome.value
+            else:
+                errors[outcome.key] = outcome.error
+    finally:
+        stream.close()
+    results = Results((key, values[key]) for key in keys if key in values)
+    results.errors.update((key, errors[key]) for key in keys
+                          if key in errors)
+    return results
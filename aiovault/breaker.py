@@ -0,0 +1,157 @@
+import asyncio
+from .exceptions import CircuitOpen, DownError, HTTPError
+from aiohttp import ClientConnectionError, ServerDisconnectedError
+
+__all__ = ['CircuitBreaker', 'CLOSED', 'OPEN', 'HALF_OPEN']
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class Circuit:
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe = None
+
+    def __repr__(self):
+        return '<Circuit(state=%r, failures=%r)>' % (self.state, self.failures)
+
+
+class CircuitBreaker:
+    """Fails fast on the nodes that keep failing.
+
+    Each node has its own circuit. After ``threshold`` consecutive
+    failures, its circuit opens and requests to this node raise
+    :class:`CircuitOpen` right away. Once ``recovery`` seconds are elapsed,
+    the circuit becomes half-open: a single probe checks the health of
+    the node, and closes the circuit when the node is healthy again.
+
+    Parameters:
+        threshold (int): Consecutive failures that open a circuit
+        recovery (float): Seconds before an open circuit is probed
+    """
+
+    def __init__(self, *, threshold=5, recovery=10):
+        self.threshold = threshold
+        self.recovery = recovery
+        self._circuits = {}
+
+    def circuit(self, addr):
+        if addr not in self._circuits:
+            self._circuits[addr] = Circuit()
+        return self._circuits[addr]
+
+    def state(self, addr):
+        """Returns the state of the circuit of a node
+
+        Parameters:
+            addr (str): The node address
+        Returns:
+            str: One of ``closed``, ``open`` or ``half-open``
+        """
+        return self.circuit(addr).state
+
+    def states(self):
+        """Returns the states of all known circuits
+
+        Returns:
+            dict: The state by node address
+        """
+        return {addr: circuit.state for addr, circuit
+                in self._circuits.items()}
+
+    def opened(self):
+        """Returns the nodes that are not available
+
+        Returns:
+            set
+        """
+        return {addr for addr, circuit in self._circuits.items()
+                if circuit.state != CLOSED}
+
+    @asyncio.coroutine
+    def check(self, addr, probe):
+        """Ensures that a request can be sent to a node.
+
+        Parameters:
+            addr (str): The node address
+            probe (coroutine): Checks the health of the given node
+        Raises:
+            CircuitOpen: The node is not available
+        """
+        circuit = self.circuit(addr)
+        if circuit.state == CLOSED:
+            return
+
+        loop = asyncio.get_event_loop()
+        if circuit.probe is None:
+            if loop.time() < circuit.opened_at + self.recovery:
+                raise CircuitOpen({'errors': ['%s is not available' % addr]})
+            circuit.state = HALF_OPEN
+            circuit.probe = asyncio.async(probe(addr), loop=loop)
+
+        try:
+            yield from asyncio.shield(circuit.probe)
+        except Exception:
+            if circuit.state == HALF_OPEN:
+                self.trip(addr)
+            raise CircuitOpen({'errors': ['%s is not available' % addr]})
+        else:
+            self.success(addr)
+
+    def trips(self, error):
+        """Tells if error is a failure of the node
+
+        Parameters:
+            error (Exception): The error raised by a request
+        Returns:
+            bool
+        """
+        if isinstance(error, CircuitOpen):
+            return False
+        if isinstance(error, DownError):
+            return True
+        if isinstance(error, HTTPError):
+            return (getattr(error, 'status', None) or 0) >= 500
+        return isinstance(error, (ClientConnectionError,
+                                  ServerDisconnectedError,
+                                  asyncio.TimeoutError))
+
+    def success(self, addr):
+        """Records a success of a node, and closes its circuit
+
+        Parameters:
+            addr (str): The node address
+        """
+        circuit = self.circuit(addr)
+        circuit.state, circuit.failures = CLOSED, 0
+        circuit.opened_at, circuit.probe = None, None
+
+    def failure(self, addr):
+        """Records a failure of a node
+
+        Parameters:
+            addr (str): The node address
+        """
+        circuit = self.circuit(addr)
+        circuit.failures += 1
+        if circuit.state == HALF_OPEN or circuit.failures >= self.threshold:
+            self.trip(addr)
+
+    def trip(self, addr):
+        """Opens the circuit of a node
+
+        Parameters:
+            addr (str): The node address
+        """
+        loop = asyncio.get_event_loop()
+        circuit = self.circuit(addr)
+        circuit.state, circuit.opened_at = OPEN, loop.time()
+        circuit.probe = None
+
+    def __repr__(self):
+        return '<CircuitBreaker(states=%r)>' % self.states()
@@ -0,0 +1,215 @@
+import time
+from collections import OrderedDict
+
+__all__ = ['CacheStats', 'LRUCache', 'PlaintextCache']
+
+
+class CacheStats:
+    """Counts the cache usage.
+
+    Attributes:
+        hits (int): Lookups that found a live entry
+        misses (int): Lookups that found nothing, or an expired entry
+        evictions (int): Entries dropped to respect the size limit
+        expirations (int): Entries dropped because they expired
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __repr__(self):
+        return '<CacheStats(hits=%r, misses=%r, evictions=%r)>' % (
+            self.hits, self.misses, self.evictions)
+
+
+class LRUCache:
+    """In-process cache, bounded in size and in time.
+
+    The least recently used entries are evicted first. Each entry expires
+    after its own ttl, bounded by the cache ttl::
+
+        client = Vault(addr, cache=LRUCache(maxsize=1000, ttl=300))
+
+    Parameters:
+        maxsize (int): The maximum number of entries
+        ttl (float): The maximum lifetime of an entry, in seconds
+        negative_ttl (float): How long, in seconds, a missing key is
+                              remembered. Disabled by default
+        on_evict (callable): Called with the key and the value of each
+                             entry that leaves the cache, whatever the
+                             reason
+    """
+
+    def __init__(self, *, maxsize=1024, ttl=300, negative_ttl=0,
+                 on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.on_evict = on_evict
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._counter = self._floor = 0
+
+    def drop(self, key):
+        value, expires = self._entries.pop(key)
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def get(self, key, default=None):
+        """Returns the live value of key, or default
+
+        Parameters:
+            key (obj): The entry key
+            default (obj): Returned when there is no live entry
+        Returns:
+            obj
+        """
+        try:
+            value, expires = self._entries[key]
+        except KeyError:
+            self.stats.misses += 1
+            return default
+        if expires <= time.monotonic():
+            self.drop(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Stores value under key
+
+        Parameters:
+            key (obj): The entry key
+            value (obj): The value to store
+            ttl (float): The lifetime of the entry, bounded by the cache ttl
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if key in self._entries and self._entries[key][0] is not value:
+            self.drop(key)
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = value, time.monotonic() + ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self.drop(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def pop(self, key):
+        """Drops the entry of key, if any
+
+        Parameters:
+            key (obj): The entry key
+        """
+        if key in self._entries:
+            self.drop(key)
+
+    def invalidate(self, match):
+        """Drops the entries whose key matches
+
+        Parameters:
+            match (callable): Receives a key, returns True to drop it
+        """
+        for key in [key for key in self._entries if match(key)]:
+            self.drop(key)
+
+    def version(self, tag):
+        """Returns the version of tag, which changes each time it is bumped
+
+        A value read while the version of its tag changed must not be
+        stored, as it may predate a write.
+
+        Parameters:
+            tag (obj): Identifies a group of entries, such as a path
+        Returns:
+            int
+        """
+        return self._versions.get(tag, self._floor)
+
+    def bump(self, tag):
+        """Changes the version of tag
+
+        Parameters:
+            tag (obj): Identifies a group of entries, such as a path
+        """
+        self._counter += 1
+        self._versions[tag] = self._counter
+        self._versions.move_to_end(tag)
+        while len(self._versions) > self.maxsize:
+            # forgotten tags get the latest version forgotten, so that
+            # their reads in flight are not stored
+            tag, version = self._versions.popitem(last=False)
+            self._floor = max(self._floor, version)
+
+    def clear(self):
+        """Drops all entries"""
+        for key in list(self._entries):
+            self.drop(key)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return '<LRUCache(maxsize=%r, ttl=%r, size=%r)>' % (
+            self.maxsize, self.ttl, len(self._entries))
+
+
+def zeroize_entry(key, value):
+    """Overwrites a bytearray with zeros"""
+    if isinstance(value, bytearray):
+        value[:] = bytes(len(value))
+
+
+class PlaintextCache(LRUCache):
+    """Caches the plaintexts decrypted by the transit backends.
+
+    Only the transit keys that are enabled are cached, so that sensitive
+    keys always need a round trip::
+
+        cache = PlaintextCache(keys=['customers'], ttl=60)
+        client = Vault(addr, decrypt_cache=cache)
+
+    Plaintexts are held in bytearrays, which are overwritten with zeros
+    when they leave the cache. This is a best effort: the copies made
+    while reading the responses, and the ones returned to the callers,
+    are not wiped.
+
+    Parameters:
+        keys (list): The transit keys to cache
+        maxsize (int): The maximum number of entries
+        ttl (float): The maximum lifetime of an entry, in seconds
+        zeroize (bool): Wipe the plaintexts that leave the cache
+    """
+
+    def __init__(self, *, keys=(), maxsize=1024, ttl=60, zeroize=True):
+        super().__init__(maxsize=maxsize, ttl=ttl,
+                         on_evict=zeroize_entry if zeroize else None)
+        self.keys = set(keys)
+
+    def enabled(self, key):
+        """Tells if the plaintexts of a transit key are cached"""
+        return key in self.keys
+
+    def enable(self, key):
+        """Caches the plaintexts of a transit key"""
+        self.keys.add(key)
+
+    def disable(self, key):
+        """Stops caching the plaintexts of a transit key, and drops them"""
+        self.keys.discard(key)
+        self.invalidate(lambda entry: entry[1] == key)
+
+    def __repr__(self):
+        return '<PlaintextCache(keys=%r, maxsize=%r, ttl=%r, size=%r)>' % (
+            sorted(self.keys), self.maxsize, self.ttl, len(self))
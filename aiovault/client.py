@@ -1,14 +1,32 @@
+import asyncio
+import copy
 from . import v1
+from .batch import run_many
+from .exceptions import InvalidPath
+from .objects import Value
 from .request import Request
 from .util import task, extract_id
 
 
 class Vault(v1.SysEndpoint):
+    """The vault client.
 
-    def __init__(self, addr, token=None, cert=None, verify=True):
+    Parameters:
+        addr (str): The vault address, or the list of the addresses of
+                    the nodes of a high availability cluster
+        token (str): The client token
+        cert (tuple): The client certificate and key files
+        verify (bool): Verify the server certificate, or the CA path
+        options (dict): Connection options, such as the pool ``limit``,
+                        a shared ``transport``, a ``retry`` policy or a
+                        default ``timeout``.
+                        See :class:`aiovault.request.Request`
+    """
+
+    def __init__(self, addr, token=None, cert=None, verify=True, **options):
         token = extract_id(token)
         self.req_handler = Request(addr, 'v1', token=token,
-                                   cert=cert, verify=verify)
+                                   cert=cert, verify=verify, **options)
 
     @property
     def audit(self):
@@ -38,6 +56,38 @@ class Vault(v1.SysEndpoint):
     def secret(self):
         return v1.SecretEndpoint(self.req_handler)
 
+    def using(self, token):
+        """Returns a client that acts with another token.
+
+        Both clients share the same connections::
+
+            client = root.using(token)
+            yield from client.secret.generic.read('foo')
+
+        Parameters:
+            token (str): The client token
+        Returns:
+            Vault
+        """
+        client = copy.copy(self)
+        client.req_handler = self.req_handler.using(token)
+        return client
+
+    def manage_token(self, login=None, **options):
+        """Returns a manager that keeps the client token alive.
+
+        The manager takes over once started. See
+        :class:`aiovault.v1.auth.TokenManager`.
+
+        Parameters:
+            login (dict): The arguments of :meth:`login`, to log in again
+                          when the token cannot be renewed
+            options (dict): The options of the manager
+        Returns:
+            TokenManager
+        """
+        return v1.auth.TokenManager(self.req_handler, login=login, **options)
+
     @task
     def login(self, *args, **kwargs):
         return self.auth.login(*args, **kwargs)
@@ -48,6 +98,29 @@ class Vault(v1.SysEndpoint):
         response = yield from self.req_handler(method, path, **kwargs)
         return response
 
+    @task
+    def read_many(self, paths, *, concurrency=10):
+        """Reads many secrets, with bounded parallelism.
+
+        Parameters:
+            paths (list): The secret paths, such as ``/secret/foo``
+            concurrency (int): The maximum number of reads in flight
+        Returns:
+            Results: The values by path, and the errors by path.
+                     Missing paths fail with KeyError
+        """
+        @asyncio.coroutine
+        def read(path):
+            try:
+                response = yield from self.req_handler('GET', path)
+            except InvalidPath:
+                raise KeyError('%r does not exists' % path)
+            result = yield from response.json()
+            return Value(**result)
+
+        results = yield from run_many(read, paths, concurrency=concurrency)
+        return results
+
     @task
     def write(self, path, **kwargs):
         method = kwargs.pop('method', 'POST')
@@ -60,5 +133,9 @@ class Vault(v1.SysEndpoint):
         response = yield from self.req_handler(method, path, **kwargs)
         return response
 
+    def close(self):
+        """Closes the underlying connections"""
+        self.req_handler.close()
+
     def __repr__(self):
         return '<Vault(addr=%r)>' % self.req_handler.addr
@@ -0,0 +1,408 @@
+import asyncio
+import random
+from collections import deque
+from functools import partial
+from .batch import Results, run_many
+from .util import log_failure, task
+from .v1.lease import LeaseEndpoint
+
+__all__ = ['CredentialsPool', 'CredentialsProvider', 'shared_provider']
+
+
+class Entry:
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+        self.handle = None
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+
+class CredentialsProvider:
+    """Caches dynamic credentials, one set per role.
+
+    Credentials are minted on the first request for a role, and shared by
+    all the callers, concurrent ones included. They are minted again in
+    the background, at a jittered fraction of their lease, so that callers
+    never wait for them once the cache is warm::
+
+        provider = backend.credentials()
+        creds = yield from provider.get('readonly')
+        connect(user=creds['username'], password=creds['password'])
+
+    Previous credentials are left to expire, so that connections opened
+    with them keep working until their lease is up. The provider keeps
+    track of their leases, and revokes them all when it is closed.
+
+    A role that has not been read for a whole lease is not refreshed
+    anymore. Its credentials are left to expire, and are minted again on
+    the next read.
+
+    Parameters:
+        mint (coroutine): Generates the credentials of a role, such as
+                          ``backend.creds``
+        revoke (coroutine): Revokes a lease id
+        fraction (float): The part of the lease after which credentials
+                          are minted again
+        jitter (float): The spread of the refresh time, as a part of it
+        retry (float): Seconds between retries of a failed refresh
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, mint, *, revoke=None, fraction=2 / 3, jitter=0.1,
+                 retry=5, loop=None):
+        self.mint = mint
+        self.revoke = revoke
+        self.fraction = fraction
+        self.jitter = jitter
+        self.retry = retry
+        self.loop = loop or asyncio.get_event_loop()
+        self._entries = {}
+        self._pending = {}
+        self._leases = {}
+        self._generations = {}
+        self._reads = {}
+        self.users = 1
+
+    @asyncio.coroutine
+    def get(self, role):
+        """Returns the credentials of a role.
+
+        The returned value is shared, and must not be modified.
+
+        Parameters:
+            role (str): The role name
+        Returns:
+            Value
+        """
+        entry = self._entries.get(role)
+        self._reads[role] = now = self.loop.time()
+        if entry is not None and now < entry.expires:
+            return entry.value
+        value = yield from asyncio.shield(self.fetch(role), loop=self.loop)
+        return value
+
+    def fetch(self, role):
+        """Mints the credentials of a role, once for concurrent callers
+
+        Parameters:
+            role (str): The role name
+        Returns:
+            Future
+        """
+        if role not in self._pending:
+            generation = self._generations.get(role, 0)
+            future = asyncio.async(self.refresh(role, generation),
+                                   loop=self.loop)
+            future.add_done_callback(partial(self.fetched, role))
+            self._pending[role] = future
+        return self._pending[role]
+
+    def fetched(self, role, future):
+        if self._pending.get(role) is future:
+            del self._pending[role]
+
+    @asyncio.coroutine
+    def refresh(self, role, generation):
+        value = yield from self.mint(role)
+        now = self.loop.time()
+        duration = value.lease_duration
+        expires = now + duration if duration else float('inf')
+        if value.lease_id:
+            self.prune()
+            self._leases[value.lease_id] = expires
+        if self._generations.get(role, 0) != generation:
+            # invalidated while minting, these credentials are not cached
+            return value
+        entry = Entry(value, expires)
+        self.store(role, entry)
+        if duration:
+            delay = duration * self.fraction
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.schedule(role, entry, min(now + delay, entry.expires))
+        return value
+
+    def store(self, role, entry):
+        previous = self._entries.get(role)
+        if previous is not None:
+            previous.cancel()
+        self._entries[role] = entry
+
+    def schedule(self, role, entry, when):
+        entry.cancel()
+        entry.handle = self.loop.call_at(when, self._refresh, role, entry)
+
+    def _refresh(self, role, entry):
+        entry.handle = None
+        idle = self.loop.time() - self._reads.get(role, float('-inf'))
+        if idle >= entry.value.lease_duration:
+            # nobody asked for them for a whole lease, let them expire
+            return
+
+        def refreshed(future):
+            if future.cancelled() or not future.exception():
+                return
+            # keep the current credentials, and try again before they expire
+            if self._entries.get(role) is entry:
+                now = self.loop.time()
+                if now < entry.expires:
+                    self.schedule(role, entry,
+                                  min(now + self.retry, entry.expires))
+
+        self.fetch(role).add_done_callback(refreshed)
+
+    def invalidate(self, role):
+        """Forgets the credentials of a role, for example once rejected
+
+        Parameters:
+            role (str): The role name
+        """
+        self._generations[role] = self._generations.get(role, 0) + 1
+        self._pending.pop(role, None)
+        entry = self._entries.pop(role, None)
+        if entry is not None:
+            entry.cancel()
+
+    def leases(self):
+        """Returns the ids of the leases that are not expired yet
+
+        Returns:
+            list
+        """
+        self.prune()
+        return sorted(self._leases)
+
+    def prune(self):
+        now = self.loop.time()
+        for lease_id, expires in list(self._leases.items()):
+            if expires <= now:
+                del self._leases[lease_id]
+
+    @task
+    def close(self, *, revoke=True, concurrency=10):
+        """Stops refreshing the credentials, and revokes their leases.
+
+        A shared provider is only closed by its last user.
+
+        Parameters:
+            revoke (bool): Revoke the leases that are not expired yet
+            concurrency (int): The maximum number of revocations in flight
+        Returns:
+            Results: The revoked leases, and the errors by lease id
+        """
+        self.users -= 1
+        if self.users > 0:
+            return Results()
+        for future in list(self._pending.values()):
+            future.cancel()
+        for role in list(self._entries):
+            self.invalidate(role)
+        self._reads.clear()
+        lease_ids = self.leases()
+        self._leases.clear()
+        if not revoke or self.revoke is None:
+            return Results()
+        results = yield from run_many(self.revoke, lease_ids,
+                                      concurrency=concurrency)
+        return results
+
+    def __repr__(self):
+        return '<CredentialsProvider(roles=%r)>' % sorted(self._entries)
+
+
+class Item:
+
+    def __init__(self, value, ready, stale):
+        self.value = value
+        self.ready = ready
+        self.stale = stale
+
+
+class CredentialsPool:
+    """Keeps credentials minted ahead of time, per role.
+
+    Some credentials take a while to be usable once minted, such as IAM
+    users that are eventually consistent. The pool keeps ``size``
+    credentials per role, which are handed out only once they are older
+    than ``warmup`` seconds. Taking one is O(1), and triggers a refill in
+    the background::
+
+        pool = backend.pool(size=10, warmup=10)
+        pool.fill('deploy')
+        creds = yield from pool.get('deploy')
+
+    Handed out credentials belong to the caller. The ones that get too
+    close to their expiry are revoked as they are dropped, and the unused
+    ones are revoked when the pool is closed. Closing the pool cancels the
+    callers that wait for credentials.
+
+    Parameters:
+        mint (coroutine): Generates the credentials of a role, such as
+                          ``backend.creds``
+        revoke (coroutine): Revokes a lease id
+        size (int): The number of credentials to keep per role
+        warmup (float): Seconds before minted credentials are handed out
+        min_ttl (float): Credentials that expire sooner are discarded
+        concurrency (int): The maximum number of credentials minted at once
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, mint, *, revoke=None, size=5, warmup=10, min_ttl=60,
+                 concurrency=2, loop=None):
+        self.mint = mint
+        self.revoke = revoke
+        self.size = size
+        self.warmup = warmup
+        self.min_ttl = min_ttl
+        self.loop = loop or asyncio.get_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency, loop=self.loop)
+        self._pools = {}
+        self._minting = {}
+        self._minted = {}
+        self._closed = False
+
+    def fill(self, role):
+        """Mints credentials, until the pool of the role is full
+
+        Parameters:
+            role (str): The role name
+        """
+        pool = self._pools.setdefault(role, deque())
+        minting = self._minting.setdefault(role, set())
+        for _ in range(self.size - len(pool) - len(minting)):
+            minter = asyncio.async(self.produce(role), loop=self.loop)
+            minting.add(minter)
+            minter.add_done_callback(minting.discard)
+
+    @asyncio.coroutine
+    def produce(self, role):
+        with (yield from self.semaphore):
+            try:
+                value = yield from self.mint(role)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.notify(role, error)
+                return
+        now, duration = self.loop.time(), value.lease_duration
+        stale = float('inf')
+        if duration:
+            stale = now + duration - min(self.min_ttl, duration / 2)
+        self._pools[role].append(Item(value, now + self.warmup, stale))
+        self.notify(role)
+
+    def notify(self, role, error=None):
+        waiter = self._minted.pop(role, None)
+        if waiter is not None and not waiter.done():
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
+
+    @asyncio.coroutine
+    def get(self, role):
+        """Takes credentials of a role out of the pool.
+
+        When the pool is empty, this waits for new credentials to be
+        minted, and warmed up.
+
+        Parameters:
+            role (str): The role name
+        Returns:
+            Value
+        Raises:
+            CancelledError: The pool is closed
+        """
+        while True:
+            if self._closed:
+                raise asyncio.CancelledError()
+            pool = self._pools.setdefault(role, deque())
+            now = self.loop.time()
+            while pool and pool[0].stale <= now:
+                self.discard(pool.popleft())
+            self.fill(role)
+            if pool and pool[0].ready <= now:
+                item = pool.popleft()
+                self.fill(role)
+                return item.value
+            if pool:
+                yield from asyncio.sleep(pool[0].ready - now, loop=self.loop)
+                continue
+            if role not in self._minted:
+                self._minted[role] = asyncio.Future(loop=self.loop)
+            yield from asyncio.shield(self._minted[role], loop=self.loop)
+
+    def discard(self, item):
+        """Revokes the lease of dropped credentials, in the background"""
+        if self.revoke is None or not item.value.lease_id:
+            return
+        future = asyncio.async(self.revoke(item.value.lease_id),
+                               loop=self.loop)
+        future.add_done_callback(log_failure)
+
+    def available(self, role):
+        """Returns the number of credentials of a role in the pool"""
+        return len(self._pools.get(role, ()))
+
+    @task
+    def close(self, *, concurrency=10):
+        """Stops minting credentials, and revokes the unused ones.
+
+        Parameters:
+            concurrency (int): The maximum number of revocations in flight
+        Returns:
+            Results: The revoked leases, and the errors by lease id
+        """
+        self._closed = True
+        for minting in self._minting.values():
+            for minter in list(minting):
+                minter.cancel()
+        for waiter in self._minted.values():
+            waiter.cancel()
+        self._minted.clear()
+        lease_ids = [item.value.lease_id for pool in self._pools.values()
+                     for item in pool if item.value.lease_id]
+        self._pools.clear()
+        if self.revoke is None:
+            return Results()
+        results = yield from run_many(self.revoke, lease_ids,
+                                      concurrency=concurrency)
+        return results
+
+    def __repr__(self):
+        return '<CredentialsPool(size=%r, roles=%r)>' % (
+            self.size, sorted(self._pools))
+
+
+def shared_provider(backend, **options):
+    """Returns the credentials provider of a backend.
+
+    Providers are shared by all the backends of a client that target the
+    same mount with the same token, so that a client holds one set of
+    credentials per role. Separate clients have separate providers, even
+    in the same process. Each call must be matched by a call to
+    ``close()``, and the leases are revoked by the last one.
+
+    Parameters:
+        backend (SecretBackend): A backend with a ``creds`` method
+        options (dict): See :class:`CredentialsProvider`. They only apply
+                        when the provider is created
+    Returns:
+        CredentialsProvider
+    """
+    req_handler = backend.req_handler
+    providers = req_handler.providers
+    key = (backend.name, req_handler.token)
+    provider = providers.get(key)
+    if provider is None or provider.users <= 0:
+        lease = LeaseEndpoint(req_handler)
+        provider = CredentialsProvider(backend.creds, revoke=lease.revoke,
+                                       **options)
+        providers[key] = provider
+    else:
+        provider.users += 1
+    return provider
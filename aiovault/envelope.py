@@ -0,0 +1,336 @@
+import asyncio
+import json
+import struct
+from .batch import Ordered
+from .cache import LRUCache
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = InvalidTag = None
+
+__all__ = ['Envelope', 'Header']
+
+#: starts every container
+MAGIC = b'AIOVENV1'
+
+#: the size of the AES-GCM authentication tag
+TAG_SIZE = 16
+
+LENGTH = struct.Struct('>I')
+NONCE = struct.Struct('>4xQ')
+AAD = struct.Struct('>Q?')
+
+
+class Header:
+    """Describes an envelope container.
+
+    A container is made of this header, followed by frames. Each frame
+    holds a chunk of plaintext, encrypted with AES-GCM, and prefixed with
+    its length. All chunks have the same size, except the last one, so
+    that any chunk can be located without reading the previous ones.
+
+    Parameters:
+        key (str): The transit key that wraps the data key
+        ciphertext (str): The wrapped data key
+        chunk_size (int): The size of the plaintext chunks
+        raw (bytes): The header, as written in the container
+    """
+
+    def __init__(self, key, ciphertext, chunk_size, *, raw=None):
+        self.key = key
+        self.ciphertext = ciphertext
+        self.chunk_size = chunk_size
+        if raw is None:
+            content = json.dumps({'key': key,
+                                  'ciphertext': ciphertext,
+                                  'chunk_size': chunk_size}, sort_keys=True)
+            content = content.encode('utf-8')
+            raw = MAGIC + LENGTH.pack(len(content)) + content
+        # authenticated along with each chunk
+        self.raw = raw
+
+    @property
+    def size(self):
+        """The offset of the first frame"""
+        return len(self.raw)
+
+    @property
+    def frame_size(self):
+        """The size of a full frame"""
+        return LENGTH.size + self.chunk_size + TAG_SIZE
+
+    @classmethod
+    def load(cls, file):
+        """Reads the header at the current position of file
+
+        Parameters:
+            file (file): A binary file object
+        Returns:
+            Header
+        Raises:
+            ValueError: file is not an envelope container
+        """
+        prefix = read_exactly(file, len(MAGIC) + LENGTH.size)
+        if prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError('not an envelope container')
+        length, = LENGTH.unpack(prefix[len(MAGIC):])
+        raw = read_exactly(file, length)
+        if len(raw) < length:
+            raise ValueError('truncated envelope container')
+        content = json.loads(raw.decode('utf-8'))
+        return cls(content['key'], content['ciphertext'],
+                   content['chunk_size'], raw=prefix + raw)
+
+    def __repr__(self):
+        return '<Header(key=%r, chunk_size=%r)>' % (self.key, self.chunk_size)
+
+
+def read_exactly(file, size):
+    """Reads size bytes, unless the end of file is reached before"""
+    chunks, missing = [], size
+    while missing > 0:
+        chunk = file.read(missing)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        missing -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+
+def read_frame(file):
+    """Reads the next frame, or returns None at the end of file"""
+    prefix = read_exactly(file, LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < LENGTH.size:
+        raise ValueError('truncated envelope container')
+    length, = LENGTH.unpack(prefix)
+    frame = read_exactly(file, length)
+    if len(frame) < length:
+        raise ValueError('truncated envelope container')
+    return frame
+
+
+def write_frame(file, frame):
+    file.write(LENGTH.pack(len(frame)))
+    file.write(frame)
+
+
+class Envelope:
+    """Encrypts large files locally, with a data key wrapped by transit.
+
+    A new data key is generated by the transit backend for each file,
+    which costs a single round trip. The file is then encrypted by chunks
+    with AES-GCM, in a thread pool, and written as a framed container
+    that embeds the wrapped data key::
+
+        envelope = backend.envelope('my-key')
+        with open('dump.sql', 'rb') as src, open('dump.enc', 'wb') as dst:
+            yield from envelope.encrypt(src, dst)
+
+    Containers can be decrypted as a stream, or chunk by chunk for
+    seekable files. Each chunk is bound to its position, and the last one
+    is marked as such, so that reordered or truncated containers are
+    rejected.
+
+    Unwrapped data keys are kept in a small cache, so that reading
+    several chunks of a container costs a single round trip. The cache is
+    bounded in size and in time, and can be disabled with
+    ``cache_size=0`` to drop each key as soon as its file is done.
+
+    This requires the ``cryptography`` package, which can be installed
+    with ``pip install aiovault[envelope]``.
+
+    Parameters:
+        backend (TransitBackend): The transit backend
+        key (str): The transit key that wraps the data keys
+        context (str): Context for key derivation. Required for derived
+                       keys
+        chunk_size (int): The size of the plaintext chunks
+        concurrency (int): The maximum number of chunks in flight
+        executor (Executor): Runs the file operations and the ciphers.
+                             Defaults to the loop executor
+        cache_size (int): The maximum number of data keys kept unwrapped
+        cache_ttl (float): How long, in seconds, a data key is kept
+    """
+
+    def __init__(self, backend, key, *, context=None, chunk_size=65536,
+                 concurrency=4, executor=None, cache_size=16, cache_ttl=300):
+        if AESGCM is None:
+            raise ImportError('envelope encryption requires cryptography, '
+                              'install aiovault[envelope]')
+        self.backend = backend
+        self.key = key
+        self.context = context
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.executor = executor
+        self._ciphers = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @asyncio.coroutine
+    def run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        result = yield from loop.run_in_executor(self.executor, func, *args)
+        return result
+
+    @asyncio.coroutine
+    def cipher(self, header):
+        """Returns the cipher of a container, unwrapping its data key
+        unless it is still cached
+        """
+        cipher = self._ciphers.get(header.ciphertext)
+        if cipher is None:
+            result = yield from self.backend.decrypt(header.key,
+                                                     header.ciphertext,
+                                                     self.context,
+                                                     binary=True)
+            cipher = AESGCM(result['plaintext'])
+            self._ciphers.set(header.ciphertext, cipher)
+        return cipher
+
+    @asyncio.coroutine
+    def encrypt(self, source, dest):
+        """Encrypts source into dest.
+
+        Parameters:
+            source (file): The binary file to encrypt
+            dest (file): The binary file that receives the container
+        Returns:
+            int: The number of chunks
+        """
+        datakey = yield from self.backend.datakey(self.key,
+                                                  context=self.context)
+        cipher = AESGCM(datakey['plaintext'])
+        header = Header(self.key, datakey['ciphertext'], self.chunk_size)
+        self._ciphers.set(header.ciphertext, cipher)
+        yield from self.run(dest.write, header.raw)
+
+        @asyncio.coroutine
+        def read():
+            data = yield from self.run(read_exactly, source, self.chunk_size)
+            return data
+
+        @asyncio.coroutine
+        def seal(item):
+            index, data, final = item
+            frame = yield from self.run(cipher.encrypt, NONCE.pack(index),
+                                        data, header.raw + AAD.pack(index,
+                                                                    final))
+            return frame
+
+        count = yield from self.pipe(read, seal, dest, framed=True)
+        return count
+
+    @asyncio.coroutine
+    def decrypt(self, source, dest):
+        """Decrypts the container of source into dest.
+
+        Parameters:
+            source (file): The binary file of the container
+            dest (file): The binary file that receives the plaintext
+        Returns:
+            int: The number of chunks
+        Raises:
+            ValueError: The container is corrupted or truncated
+        """
+        header = yield from self.run(Header.load, source)
+        cipher = yield from self.cipher(header)
+
+        @asyncio.coroutine
+        def read():
+            frame = yield from self.run(read_frame, source)
+            return b'' if frame is None else frame
+
+        @asyncio.coroutine
+        def open_(item):
+            index, frame, final = item
+            try:
+                data = yield from self.run(cipher.decrypt, NONCE.pack(index),
+                                           frame, header.raw + AAD.pack(
+                                               index, final))
+            except InvalidTag:
+                raise ValueError('chunk %s is corrupted' % index)
+            return data
+
+        count = yield from self.pipe(read, open_, dest, framed=False)
+        return count
+
+    @asyncio.coroutine
+    def decrypt_chunk(self, source, index):
+        """Decrypts a single chunk of a seekable container.
+
+        Parameters:
+            source (file): The binary file of the container
+            index (int): The position of the chunk
+        Returns:
+            bytes: The plaintext of the chunk. It starts at the offset
+                   ``index * chunk_size`` of the original file
+        Raises:
+            IndexError: There is no such chunk
+            ValueError: The chunk is corrupted
+        """
+        def locate():
+            source.seek(0)
+            header = Header.load(source)
+            end = source.seek(0, 2)
+            count = -(-(end - header.size) // header.frame_size)
+            if not 0 <= index < count:
+                raise IndexError('chunk %s out of range' % index)
+            source.seek(header.size + index * header.frame_size)
+            return header, read_frame(source), index == count - 1
+
+        header, frame, final = yield from self.run(locate)
+        cipher = yield from self.cipher(header)
+        try:
+            data = yield from self.run(cipher.decrypt, NONCE.pack(index),
+                                       frame, header.raw + AAD.pack(index,
+                                                                    final))
+        except InvalidTag:
+            raise ValueError('chunk %s is corrupted' % index)
+        return data
+
+    @asyncio.coroutine
+    def pipe(self, read, func, dest, *, framed):
+        """Runs func over the chunks returned by read, in order.
+
+        The chunks are read one ahead, so that the last one is known.
+        An empty input still makes a single empty chunk, so that empty
+        containers cannot be forged by truncation.
+        """
+        index, ahead = 0, (yield from read())
+
+        @asyncio.coroutine
+        def chunks():
+            nonlocal index, ahead
+            if ahead is None:
+                return None
+            data, ahead = ahead, (yield from read())
+            final = not ahead
+            item = index, data, final
+            index += 1
+            if final:
+                ahead = None
+            return item
+
+        stream = Ordered(func, chunks, concurrency=self.concurrency)
+        count = 0
+        try:
+            while True:
+                outcome = yield from stream.next()
+                if outcome is None:
+                    return count
+                if outcome.error is not None:
+                    raise outcome.error
+                if framed:
+                    yield from self.run(write_frame, dest, outcome.value)
+                else:
+                    yield from self.run(dest.write, outcome.value)
+                count += 1
+        finally:
+            stream.close()
+
+    def __repr__(self):
+        return '<Envelope(key=%r, chunk_size=%r)>' % (
+            self.key, self.chunk_size)
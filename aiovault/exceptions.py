@@ -1,3 +1,5 @@
+import asyncio
+
 
 class HTTPError(Exception):
     """Common http errors
@@ -62,6 +64,13 @@ class DownError(HTTPError):
     """
 
 
+class CircuitOpen(DownError):
+    """Raised when a vault node failed too many times.
+
+    Requests to this node fail fast until it is healthy again
+    """
+
+
 class LoginError(InvalidRequest):
     """Raised when login failed
     """
@@ -75,3 +84,8 @@ class MountError(Exception):
 class BadToken(InvalidRequest):
     """Raised when token is bad
     """
+
+
+class RequestTimeout(asyncio.TimeoutError):
+    """Raised when a request did not complete in time
+    """
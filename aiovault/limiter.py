@@ -0,0 +1,178 @@
+import asyncio
+
+__all__ = ['Limiter', 'QueueStats', 'TokenBucket']
+
+
+class TokenBucket:
+    """Spreads requests so that they do not exceed a rate.
+
+    Parameters:
+        rate (float): The number of requests per second
+        burst (int): The number of requests that can be sent at once.
+                     Defaults to the rate
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = None
+
+    @asyncio.coroutine
+    def take(self):
+        """Waits until a request can be sent.
+
+        Tokens are reserved in order, so waiters are served first come,
+        first served.
+        """
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        if self.updated is not None:
+            elapsed = now - self.updated
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            yield from asyncio.sleep(-self.tokens / self.rate)
+
+    def __repr__(self):
+        return '<TokenBucket(rate=%r, capacity=%r)>' % (
+            self.rate, self.capacity)
+
+
+class QueueStats:
+    """Measures the time spent by requests before being sent.
+
+    This time is spent on the client side, and is not part of the server
+    latency.
+
+    Attributes:
+        requests (int): The number of admitted requests
+        waiting (int): The number of requests currently queued
+        total_wait (float): The cumulated queue time, in seconds
+        max_wait (float): The longest queue time, in seconds
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def mean_wait(self):
+        """The average queue time, in seconds"""
+        if not self.requests:
+            return 0.0
+        return self.total_wait / self.requests
+
+    def record(self, wait):
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def __repr__(self):
+        return '<QueueStats(requests=%r, waiting=%r, mean_wait=%.6f)>' % (
+            self.requests, self.waiting, self.mean_wait)
+
+
+class Slot:
+    """Holds the semaphores acquired for a request"""
+
+    def __init__(self, semaphores):
+        self.semaphores = semaphores
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def release(self):
+        while self.semaphores:
+            self.semaphores.pop().release()
+
+
+class Limiter:
+    """Bounds the requests sent by a client.
+
+    A limiter caps the number of requests in flight, and the rate at which
+    they are sent. Stricter limits can be set for some paths::
+
+        limiter = Limiter(concurrency=100, rate=500, prefixes={
+            '/transit/': Limiter(concurrency=10)
+        })
+        client = Vault(addr, limiter=limiter)
+
+    Parameters:
+        concurrency (int): The maximum number of requests in flight
+        rate (float): The maximum number of requests per second
+        burst (int): The number of requests that can be sent at once
+        prefixes (dict): Limiters that apply to the paths that start with
+                         the given prefixes, on top of this one
+    """
+
+    def __init__(self, *, concurrency=None, rate=None, burst=None,
+                 prefixes=None):
+        self.concurrency = concurrency
+        self.semaphore = None
+        if concurrency:
+            self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.prefixes = sorted((prefixes or {}).items(),
+                               key=lambda item: len(item[0]),
+                               reverse=True)
+        self.stats = QueueStats()
+
+    def limiters(self, path):
+        """Returns the limiters that apply to path"""
+        yield self
+        for prefix, limiter in self.prefixes:
+            if path.startswith(prefix):
+                yield from limiter.limiters(path)
+                break
+
+    @asyncio.coroutine
+    def acquire(self, path):
+        """Waits until a request to path can be sent.
+
+        The returned slot must be released once the request is done::
+
+            with (yield from limiter.acquire(path)):
+                yield from send()
+
+        Parameters:
+            path (str): The requested path
+        Returns:
+            Slot
+        """
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        limiters = list(self.limiters(path))
+        slot = Slot([])
+        for limiter in limiters:
+            limiter.stats.waiting += 1
+        try:
+            # the most specific limits first, so that requests waiting
+            # for them do not hold the broader ones
+            for limiter in reversed(limiters):
+                if limiter.semaphore:
+                    yield from limiter.semaphore.acquire()
+                    slot.semaphores.append(limiter.semaphore)
+            for limiter in limiters:
+                if limiter.bucket:
+                    yield from limiter.bucket.take()
+        except BaseException:
+            slot.release()
+            raise
+        finally:
+            for limiter in limiters:
+                limiter.stats.waiting -= 1
+        wait = loop.time() - started
+        for limiter in limiters:
+            limiter.stats.record(wait)
+        return slot
+
+    def __repr__(self):
+        return '<Limiter(concurrency=%r, bucket=%r)>' % (
+            self.concurrency, self.bucket)
@@ -1,54 +1,109 @@
 import asyncio
+import copy
 import json
-import os.path
-import ssl
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from .exceptions import BadToken, DownError, HTTPError, InvalidRequest
 from .exceptions import InvalidPath, InternalServerError, RateLimitExceeded
-from .exceptions import Unauthorized
-from aiohttp import ClientSession, TCPConnector
+from .exceptions import CircuitOpen, Unauthorized
+from .timeout import Timeout
+from .routing import Router
+from .transport import Transport
+from .util import extract_id, no_null, with_timeout
+from aiohttp import ClientConnectionError, ClientSession
+from aiohttp import ServerDisconnectedError
 
 
 class Request:
+    """Sends requests to vault.
 
-    def __init__(self, addr, version, token=None, cert=None, verify=True):
+    Parameters:
+        addr (str): The vault address, or the addresses of the nodes of
+                    a high availability cluster
+        version (str): The API version
+        token (str): The client token
+        cert (tuple): The client certificate and key files
+        verify (bool): Verify the server certificate, or the CA path
+        transport (Transport): A transport shared between many clients.
+                               Pool options are ignored when it is set.
+        connector (TCPConnector): An already configured connector, that
+                                  may be shared between many clients.
+                                  Pool options are ignored when it is set.
+        limit (int): The maximum number of simultaneous connections
+        limit_per_host (int): The maximum number of simultaneous
+                              connections to the same endpoint
+        keepalive_timeout (float): How long, in seconds, an idle
+                                   connection is kept open
+        ttl_dns_cache (float): How long, in seconds, resolved addresses
+                               are cached
+        retry (RetryPolicy): Retries the failed requests
+        timeout (Timeout): The default timeout of requests. A number is
+                           understood as a total timeout
+        leader_ttl (float): How long, in seconds, the leader of a cluster
+                            is remembered
+        standby_reads (bool): Spread reads over the standby nodes of a
+                              cluster
+        breaker (CircuitBreaker): Fails fast on the nodes that keep failing
+        limiter (Limiter): Bounds the requests in flight and their rate
+        coalesce (bool): Concurrent and identical reads share the same
+                         request and response
+        cache (LRUCache): Keeps the reads of generic secrets
+        decrypt_cache (PlaintextCache): Keeps the plaintexts decrypted
+                                        by the transit backends
+        lookup_cache (LRUCache): Keeps the token lookups. Its ttl caps
+                                 the lifetime of entries
+
+    Attributes:
+        token_manager (TokenManager): Keeps the client token alive, see
+                                      :meth:`aiovault.Vault.manage_token`
+
+    ``limit_per_host`` and ``ttl_dns_cache`` require a recent aiohttp.
+    """
+
+    def __init__(self, addr, version, token=None, cert=None, verify=True, *,
+                 transport=None, connector=None, limit=None,
+                 limit_per_host=None, keepalive_timeout=None,
+                 ttl_dns_cache=None, retry=None, timeout=None,
+                 leader_ttl=5, standby_reads=False, breaker=None,
+                 limiter=None, coalesce=False, cache=None,
+                 decrypt_cache=None, lookup_cache=None):
+        self.router = None
+        if isinstance(addr, (list, tuple)):
+            self.router = Router(addr,
+                                 ttl=leader_ttl,
+                                 standby_reads=standby_reads)
+            addr = self.router.addrs[0]
         self.addr = addr
         self.version = version
         self._token = token
+        self.retry = retry
+        self.timeout = Timeout.coerce(timeout)
+        self.breaker = breaker
+        self.limiter = limiter
+        self.coalesce = coalesce
+        self._inflight = {}
+        self.cache = cache
+        self.decrypt_cache = decrypt_cache
+        self.lookup_cache = lookup_cache
+        self.providers = {}
+        self.token_manager = None
+        self.call_timeout = None
+        self.deadline = None
 
-        cookies = {}
-        if self._token:
-            cookies.setdefault('token', self._token)
-
-        connector, context, ca = None, None, None
-        if verify:
-            if isinstance(verify, str):
-                verify, ca = True, verify
-        else:
-            verify = False
-
-        if addr.startswith('https://') or cert:
-            context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
-            context.options |= ssl.OP_NO_SSLv2
-            context.options |= ssl.OP_NO_SSLv3
-            if cert:
-                certfile, keyfile = cert
-                context.load_cert_chain(certfile, keyfile)
-
-            if ca:
-                context.verify_mode = ssl.CERT_REQUIRED
-                if os.path.isdir(ca):
-                    context.load_verify_locations(capath=ca)
-                else:
-                    context.load_verify_locations(cafile=ca)
-            else:
-                context.verify_mode = ssl.CERT_NONE
-
-        if verify:
-            connector = TCPConnector(verify_ssl=True, ssl_context=context)
+        self._connector_owner = transport is None and connector is None
+        self._session_owner = transport is None
+        if connector is None:
+            transport = transport or Transport(
+                limit=limit,
+                limit_per_host=limit_per_host,
+                keepalive_timeout=keepalive_timeout,
+                ttl_dns_cache=ttl_dns_cache,
+                conn_timeout=self.timeout.connect)
+            self.connector = transport.connector(addr, cert, verify)
+            self.session = transport.session(addr, cert, verify)
         else:
-            connector = TCPConnector(verify_ssl=False)
-
-        self.session = ClientSession(cookies=cookies, connector=connector)
+            self.connector = connector
+            self.session = ClientSession(connector=connector)
 
     @property
     def token(self):
@@ -57,11 +112,113 @@ class Request:
     @token.setter
     def token(self, value):
         self._token = value
-        self.session._update_cookies({'token': value})
+
+    def using(self, token):
+        """Returns a request handler that sends another token.
+
+        The new handler shares the session of this one.
+
+        Parameters:
+            token (str): The client token
+        Returns:
+            Request
+        """
+        handler = copy.copy(self)
+        handler._token = extract_id(token)
+        handler._connector_owner = handler._session_owner = False
+        handler.token_manager = None
+        return handler
+
+    def bounded(self, timeout=None, deadline=None):
+        """Returns a request handler whose requests are bounded.
+
+        The new handler shares the session of this one.
+
+        Parameters:
+            timeout (Timeout): Overrides the client timeout. A number
+                               overrides its total only
+            deadline (float): The loop time when requests must be done
+        Returns:
+            Request
+        """
+        handler = copy.copy(self)
+        handler._connector_owner = handler._session_owner = False
+        if timeout is not None and not isinstance(timeout, Timeout):
+            timeout = Timeout(timeout, connect=self.timeout.connect,
+                              read=self.timeout.read)
+        if timeout is not None:
+            handler.call_timeout = timeout
+            if timeout.total is not None:
+                expires = asyncio.get_event_loop().time() + timeout.total
+                deadline = expires if deadline is None else min(deadline,
+                                                                expires)
+        if deadline is not None and self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        if deadline is not None:
+            handler.deadline = deadline
+        return handler
 
     @asyncio.coroutine
-    def request(self, method, path, **kwargs):
-        url = '%s/%s%s' % (self.addr, self.version, path)
+    def request(self, method, path, *, token=None, idempotent=None,
+                timeout=None, deadline=None, **kwargs):
+        """Sends a request to vault.
+
+        Failed requests are retried according to the retry policy. When
+        coalescing is enabled, a read that is identical to a read in flight
+        waits for it and gets the same response.
+
+        Parameters:
+            method (str): The HTTP method
+            path (str): The path, relative to the API version
+            token (str): Sends this token instead of the client one
+            idempotent (bool): Tells if the request can be safely retried.
+                               Defaults to the retry policy methods.
+            timeout (Timeout): Overrides the client timeout. A number is
+                               understood as a total timeout
+            deadline (float): The loop time when the request must be done
+            kwargs (dict): Extra arguments for the underlying session
+        Returns:
+            ClientResponse
+        Raises:
+            RequestTimeout: The request did not complete in time
+        """
+        # requests with a managed token wait while it is swapped, and are
+        # sent once again when it was rejected
+        manager = None if token else self.token_manager
+        if manager is not None:
+            yield from manager.wait()
+            # copies of the handler keep the token they were made with
+            token = manager.req_handler.token
+        token = extract_id(token) or self._token
+        if deadline is None:
+            deadline = self.deadline
+        elif self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        kwargs.update(idempotent=idempotent, timeout=timeout,
+                      deadline=deadline)
+        try:
+            response = yield from self.submit(method, path, token, **kwargs)
+        except BadToken:
+            if manager is None:
+                raise
+            recovered = yield from manager.recover(token)
+            if not recovered:
+                raise
+            response = yield from self.submit(method, path,
+                                              manager.req_handler.token,
+                                              **kwargs)
+        return response
+
+    __call__ = request
+
+    @asyncio.coroutine
+    def submit(self, method, path, token, *, idempotent=None, timeout=None,
+               deadline=None, **kwargs):
+        """Sends a request with a token, coalescing identical reads"""
+        # the caller headers are left untouched
+        headers = dict(kwargs.get('headers') or {})
+        if token:
+            headers['X-Vault-Token'] = token
 
         for field in ('params', 'data', 'json'):
             if field in kwargs and isinstance(kwargs[field], dict):
@@ -70,12 +227,188 @@ class Request:
         data = kwargs.pop('json', None)
         if data is not None:
             kwargs['data'] = json.dumps(data)
-            headers = kwargs.setdefault('headers', {})
             headers['Content-Type'] = 'application/json'
+        if headers:
+            kwargs['headers'] = headers
+
+        if timeout is None:
+            timeout = self.call_timeout or self.timeout
+        timeout = Timeout.coerce(timeout)
+        loop = asyncio.get_event_loop()
+        if timeout.total is not None:
+            expires = loop.time() + timeout.total
+            deadline = expires if deadline is None else min(deadline, expires)
+
+        if self.coalesce and method.upper() == 'GET' and 'data' not in kwargs:
+            key = 'GET', path, token, freeze(kwargs.get('params'))
+            future = self._inflight.get(key)
+            if future is None:
+                # the shared request is bounded by the client timeout only,
+                # and each caller waits for it until its own deadline
+                shared, expires = self.timeout, None
+                if shared.total is not None:
+                    expires = loop.time() + shared.total
+                future = asyncio.async(self.perform(method, path,
+                                                    idempotent=idempotent,
+                                                    timeout=shared,
+                                                    deadline=expires,
+                                                    **kwargs), loop=loop)
+                self._inflight[key] = future
+                future.add_done_callback(
+                    lambda fut: self._inflight.pop(key, None))
+            response = yield from with_timeout(asyncio.shield(future),
+                                               deadline=deadline,
+                                               loop=loop)
+            return response
+
+        response = yield from self.perform(method, path,
+                                           idempotent=idempotent,
+                                           timeout=timeout,
+                                           deadline=deadline,
+                                           **kwargs)
+        return response
 
-        response = yield from self.session.request(method, url, **kwargs)
+    @asyncio.coroutine
+    def perform(self, method, path, *, idempotent=None, timeout=None,
+                deadline=None, **kwargs):
+        """Sends a request, and retries it according to the retry policy.
+
+        Parameters:
+            method (str): The HTTP method
+            path (str): The path, relative to the API version
+            idempotent (bool): Tells if the request can be safely retried
+            timeout (Timeout): Bounds each attempt
+            deadline (float): The loop time when the request must be done
+            kwargs (dict): Extra arguments for the underlying session
+        Returns:
+            ClientResponse
+        """
+        timeout = Timeout.coerce(timeout)
+        loop = asyncio.get_event_loop()
+        started, attempt = loop.time(), 0
+        budget = self.retry.timeout if self.retry else None
+        if self.retry and self.retry.deadline is not None:
+            # the attempt in flight is bounded by the policy deadline too
+            expires = started + self.retry.deadline
+            deadline = expires if deadline is None else min(deadline, expires)
+        while True:
+            attempt += 1
+            try:
+                response = yield from with_timeout(
+                    self.dispatch(method, path, timeout=timeout.read,
+                                  **kwargs),
+                    budget, deadline, loop=loop)
+                return response
+            except Exception as error:
+                delay = None
+                if self.retry:
+                    delay = self.retry.delay(method, attempt, error,
+                                             elapsed=loop.time() - started,
+                                             idempotent=idempotent)
+                if delay is not None and deadline is not None:
+                    if loop.time() + delay >= deadline:
+                        delay = None
+                if delay is None:
+                    raise
+            yield from asyncio.sleep(delay)
+
+    @asyncio.coroutine
+    def dispatch(self, method, path, *, timeout=None, **kwargs):
+        """Sends a single request to the node in charge of it.
+
+        Parameters:
+            method (str): The HTTP method
+            path (str): The path, relative to the API version
+            timeout (float): Seconds to wait for the response headers
+            kwargs (dict): Extra arguments for the underlying session
+        Returns:
+            ClientResponse
+        """
+        addr = self.addr
+        if self.router:
+            skip = self.breaker.opened() if self.breaker else ()
+            addr = yield from self.router.route(method, self.fetch_leader,
+                                                skip=skip)
+        url = '%s/%s%s' % (addr, self.version, path)
+
+        slot = None
+        try:
+            if self.breaker:
+                yield from self.breaker.check(addr, self.probe)
+            if self.limiter:
+                slot = yield from self.limiter.acquire(path)
+            response = yield from self.send(method, url,
+                                            timeout=timeout,
+                                            **kwargs)
+        except Exception as error:
+            if self.breaker and self.breaker.trips(error):
+                self.breaker.failure(addr)
+            unreachable = isinstance(error, (DownError,
+                                             ClientConnectionError,
+                                             ServerDisconnectedError,
+                                             asyncio.TimeoutError))
+            # an open circuit fails fast, the leader is still the same
+            if (self.router and unreachable and
+                    not isinstance(error, CircuitOpen)):
+                self.router.invalidate(addr)
+            raise
+        finally:
+            if slot:
+                slot.release()
+        if self.breaker:
+            self.breaker.success(addr)
+        return response
+
+    @asyncio.coroutine
+    def fetch_leader(self, addr):
+        """Queries the leader status of a node.
+
+        Parameters:
+            addr (str): The node address
+        Returns:
+            dict
+        """
+        url = '%s/%s/sys/leader' % (addr, self.version)
+        response = yield from self.send('GET', url, timeout=self.timeout.read)
+        result = yield from response.json()
+        return result
+
+    @asyncio.coroutine
+    def probe(self, addr):
+        """Checks the health of a node.
+
+        Standby nodes are considered healthy.
+
+        Parameters:
+            addr (str): The node address
+        Returns:
+            dict
+        """
+        url = '%s/%s/sys/health?standbyok' % (addr, self.version)
+        response = yield from self.send('GET', url, timeout=self.timeout.read)
+        result = yield from response.json()
+        return result
+
+    @asyncio.coroutine
+    def send(self, method, url, *, timeout=None, **kwargs):
+        """Sends a single request, without retrying it.
+
+        The body of successful responses is read before returning them,
+        so that their connection goes back to the pool early.
+
+        Parameters:
+            method (str): The HTTP method
+            url (str): The full url
+            timeout (float): Seconds to wait for the response headers
+            kwargs (dict): Extra arguments for the underlying session
+        Returns:
+            ClientResponse
+        """
+        response = yield from with_timeout(
+            self.session.request(method, url, **kwargs), timeout)
 
         if response.status in (200, 204):
+            yield from response.read()
             return response
 
         if response.headers['Content-Type'] == 'application/json':
@@ -84,23 +417,57 @@ class Request:
             data = yield from response.text()
 
         if response.status == 400:
-            raise InvalidRequest(data)
-        if response.status == 401:
-            raise Unauthorized(data)
-        if response.status == 403:
-            raise BadToken(data)
-        if response.status == 404:
-            raise InvalidPath(data)
-        if response.status == 429:
-            raise RateLimitExceeded(data)
-        if response.status == 500:
-            raise InternalServerError(data)
-        if response.status == 503:
-            raise DownError(data)
-        raise HTTPError(data, response.status)
+            error = InvalidRequest(data)
+        elif response.status == 401:
+            error = Unauthorized(data)
+        elif response.status == 403:
+            error = BadToken(data)
+        elif response.status == 404:
+            error = InvalidPath(data)
+        elif response.status == 429:
+            error = RateLimitExceeded(data)
+        elif response.status == 500:
+            error = InternalServerError(data)
+        elif response.status == 503:
+            error = DownError(data)
+        else:
+            error = HTTPError(data, response.status)
+        error.status = response.status
+        error.retry_after = retry_after(response.headers.get('Retry-After'))
+        raise error
 
-    __call__ = request
+    def close(self):
+        """Closes the session.
+
+        A transport or a connector given at initialization is left open,
+        because other clients may still use it.
+        """
+        if self._connector_owner:
+            self.session.close()
+        elif self._session_owner:
+            # closing the session would close the connector too
+            self.session.detach()
+
+
+def freeze(params):
+    """Makes request params hashable"""
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    if isinstance(params, list):
+        return tuple(params)
+    return params
 
 
-def no_null(data):
-    return {k: v for k, v in data.items() if v is not None}
+def retry_after(value):
+    """Parses a Retry-After header into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        pass
+    try:
+        delta = parsedate_to_datetime(value) - datetime.now(timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    return max(0, delta.total_seconds())
@@ -0,0 +1,91 @@
+import asyncio
+import random
+from .exceptions import HTTPError
+from aiohttp import ClientConnectionError, ServerDisconnectedError
+
+__all__ = ['RetryPolicy']
+
+
+class RetryPolicy:
+    """Retries failed requests, with an exponential backoff and full jitter.
+
+    Only idempotent methods are retried. Other methods, like ``PUT``, are
+    retried when the caller marks the request as idempotent::
+
+        client = Vault(addr, retry=RetryPolicy(attempts=5, deadline=10))
+        yield from client.read('/secret/foo')
+        yield from client.write('/sys/renew/foo', idempotent=True)
+
+    Parameters:
+        attempts (int): The maximum number of attempts, the first included
+        backoff (float): The base delay, in seconds
+        max_backoff (float): The maximum delay, in seconds
+        timeout (float): The budget of each attempt, in seconds
+        deadline (float): The budget of all attempts together, in seconds
+        methods (set): The methods that are safe to retry
+        statuses (set): The response status that are retried
+        retry_after (bool): Honor the ``Retry-After`` header
+    """
+
+    def __init__(self, *, attempts=3, backoff=0.1, max_backoff=10.0,
+                 timeout=None, deadline=None, methods=('GET', 'DELETE'),
+                 statuses=(429, 500, 502, 503, 504), retry_after=True):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.deadline = deadline
+        self.methods = {method.upper() for method in methods}
+        self.statuses = set(statuses)
+        self.retry_after = retry_after
+
+    def retryable(self, method, error, *, idempotent=None):
+        """Tells if the failed request can be sent again
+
+        Parameters:
+            method (str): The HTTP method
+            error (Exception): The raised error
+            idempotent (bool): Overrides the idempotency of the method
+        Returns:
+            bool
+        """
+        if idempotent is None:
+            idempotent = method.upper() in self.methods
+        if not idempotent:
+            return False
+        if isinstance(error, HTTPError):
+            return getattr(error, 'status', None) in self.statuses
+        return isinstance(error, (ClientConnectionError,
+                                  ServerDisconnectedError,
+                                  asyncio.TimeoutError))
+
+    def delay(self, method, attempt, error, *, elapsed=0, idempotent=None):
+        """Computes how long to wait before the next attempt
+
+        Parameters:
+            method (str): The HTTP method
+            attempt (int): The number of attempts already done
+            error (Exception): The error raised by the last attempt
+            elapsed (float): Seconds spent since the first attempt
+            idempotent (bool): Overrides the idempotency of the method
+        Returns:
+            float: The delay in seconds, or None when it must not be retried
+        """
+        if attempt >= self.attempts:
+            return None
+        if not self.retryable(method, error, idempotent=idempotent):
+            return None
+
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        delay = random.uniform(0, ceiling)
+        retry_after = getattr(error, 'retry_after', None)
+        if self.retry_after and retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+    def __repr__(self):
+        return '<RetryPolicy(attempts=%r, backoff=%r, deadline=%r)>' % (
+            self.attempts, self.backoff, self.deadline)
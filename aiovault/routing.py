@@ -0,0 +1,113 @@
+import asyncio
+from .exceptions import DownError
+
+__all__ = ['Router']
+
+READ_METHODS = {'GET', 'HEAD'}
+
+
+class Router:
+    """Routes requests to the nodes of a high availability cluster.
+
+    Writes are sent to the active node, which is discovered with
+    ``/sys/leader`` and remembered for a short while. Reads can be spread
+    over the standby nodes too.
+
+    Parameters:
+        addrs (list): The addresses of the vault nodes
+        ttl (float): How long, in seconds, the leader is remembered
+        standby_reads (bool): Spread reads over the standby nodes
+    Raises:
+        DownError: There is no node
+    """
+
+    def __init__(self, addrs, *, ttl=5, standby_reads=False):
+        self.addrs = [addr.rstrip('/') for addr in addrs]
+        if not self.addrs:
+            raise DownError({'errors': ['no vault node to route to']})
+        self.ttl = ttl
+        self.standby_reads = standby_reads
+        self._leader = None
+        self._expires = 0
+        self._pending = None
+        self._index = 0
+
+    @asyncio.coroutine
+    def leader(self, fetch):
+        """Returns the address of the active node.
+
+        Parameters:
+            fetch (coroutine): Queries ``/sys/leader`` of the given address
+        Returns:
+            str
+        """
+        loop = asyncio.get_event_loop()
+        if self._leader and loop.time() < self._expires:
+            return self._leader
+
+        if self._pending is None:
+            self._pending = asyncio.async(self.discover(fetch), loop=loop)
+            self._pending.add_done_callback(self._discovered)
+        leader = yield from asyncio.shield(self._pending)
+        return leader
+
+    @asyncio.coroutine
+    def discover(self, fetch):
+        """Asks the nodes which one is the active node.
+
+        Parameters:
+            fetch (coroutine): Queries ``/sys/leader`` of the given address
+        Returns:
+            str
+        Raises:
+            DownError: No node answered
+        """
+        errors = []
+        for addr in self.addrs:
+            try:
+                result = yield from fetch(addr)
+            except Exception as error:
+                errors.append('%s: %s' % (addr, error))
+                continue
+            leader = addr
+            if result.get('ha_enabled') and result.get('leader_address'):
+                leader = result['leader_address'].rstrip('/')
+            loop = asyncio.get_event_loop()
+            self._leader, self._expires = leader, loop.time() + self.ttl
+            return leader
+        raise DownError({'errors': errors})
+
+    def _discovered(self, future):
+        self._pending = None
+
+    @asyncio.coroutine
+    def route(self, method, fetch, *, skip=()):
+        """Returns the address that must receive the request.
+
+        Parameters:
+            method (str): The HTTP method
+            fetch (coroutine): Queries ``/sys/leader`` of the given address
+            skip (set): Standby nodes that must not receive reads
+        Returns:
+            str
+        """
+        leader = yield from self.leader(fetch)
+        if self.standby_reads and method.upper() in READ_METHODS:
+            standbys = [addr for addr in self.addrs
+                        if addr != leader and addr not in skip]
+            if standbys:
+                self._index = (self._index + 1) % len(standbys)
+                return standbys[self._index]
+        return leader
+
+    def invalidate(self, addr=None):
+        """Forgets the leader, so that it will be discovered again.
+
+        Parameters:
+            addr (str): Only forget the leader if it is this address
+        """
+        if addr is None or addr == self._leader:
+            self._leader, self._expires = None, 0
+
+    def __repr__(self):
+        return '<Router(addrs=%r, leader=%r)>' % (self.addrs, self._leader)
@@ -0,0 +1,89 @@
+import gzip
+import json
+import zlib
+
+__all__ = ['Reader', 'Writer']
+
+
+class Writer:
+    """Writes records as newline-delimited JSON.
+
+    Each record is a line such as ``{"data": {...}, "key": "foo/bar"}``.
+
+    Parameters:
+        stream (file): A binary file object
+        compress (bool): Compress the output with gzip
+    """
+
+    def __init__(self, stream, *, compress=False):
+        self.stream = stream
+        self.compress = compress
+        self.file = stream
+        if compress:
+            self.file = gzip.GzipFile(fileobj=stream, mode='wb')
+
+    def write(self, key, data):
+        record = {'key': key, 'data': data}
+        line = json.dumps(record, sort_keys=True, separators=(',', ':'))
+        self.file.write(line.encode('utf-8') + b'\n')
+
+    def flush(self):
+        """Pushes the records written so far down to the stream.
+
+        Compressed records can be decompressed once flushed, even if the
+        gzip member is never closed.
+        """
+        if self.compress:
+            self.file.flush(zlib.Z_SYNC_FLUSH)
+        self.stream.flush()
+
+    def close(self):
+        """Flushes the records. The underlying stream is left opened"""
+        if self.compress:
+            self.file.close()
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Reader:
+    """Reads records written by a :class:`Writer`.
+
+    The output of an interrupted writer is read up to its last complete
+    record, even when it is compressed and was never closed.
+
+    Parameters:
+        stream (file): A binary file object
+        compress (bool): The input is compressed with gzip
+        skip (int): The number of records to skip
+    """
+
+    def __init__(self, stream, *, compress=False, skip=0):
+        self.file = stream
+        if compress:
+            self.file = gzip.GzipFile(fileobj=stream, mode='rb')
+        self.skip = skip
+        self.lines = iter(self.file)
+
+    def read(self):
+        """Returns the next record as a (key, data) tuple, or None"""
+        while True:
+            try:
+                line = next(self.lines, b'')
+            except EOFError:
+                # a gzip member that has not been closed
+                return None
+            if not line.endswith(b'\n'):
+                # the end of the stream, or an incomplete record
+                return None
+            if not line.strip():
+                continue
+            if self.skip:
+                self.skip -= 1
+                continue
+            record = json.loads(line.decode('utf-8'))
+            return record['key'], record['data']
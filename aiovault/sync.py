@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+from .batch import Keys, run_many
+
+__all__ = ['SyncReport', 'digest', 'digests', 'sync']
+
+
+def digest(data):
+    """Returns the content hash of a secret
+
+    Parameters:
+        data (dict): The secret data
+    Returns:
+        str
+    """
+    content = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def digests(desired, prefix=''):
+    """Returns the content hashes of the keys and of their directories.
+
+    The hash of a directory covers the names and the contents of all the
+    keys below it, so it changes as soon as one of them changes.
+
+    Parameters:
+        desired (dict): The secret data by key
+        prefix (str): The root directory
+    Returns:
+        dict: The hashes by key, and by directory path
+    """
+    hashes, hashers = {}, {}
+    for key in sorted(desired):
+        hashes[key] = digest(desired[key])
+        parts = key[len(prefix):].split('/')[:-1]
+        directory = prefix
+        for part in [None] + parts:
+            if part is not None:
+                directory += part + '/'
+            if directory not in hashers:
+                hashers[directory] = hashlib.sha256()
+            line = '%s\0%s\n' % (key, hashes[key])
+            hashers[directory].update(line.encode('utf-8'))
+    hashes.update((path, hasher.hexdigest())
+                  for path, hasher in hashers.items())
+    return hashes
+
+
+class SyncReport:
+    """Describes the changes of a sync.
+
+    Attributes:
+        creates (list): The keys that are missing
+        updates (list): The keys whose data differ
+        deletes (list): The keys that are not desired anymore
+        unchanged (int): The number of keys that are up to date
+        skipped (list): The directories that were not checked, because
+                        they did not change since the previous sync
+        errors (dict): The errors by key, once applied
+        state (dict): The hashes to pass to the next sync
+        dry_run (bool): The changes were not applied
+    """
+
+    def __init__(self, *, dry_run=False):
+        self.creates = []
+        self.updates = []
+        self.deletes = []
+        self.unchanged = 0
+        self.skipped = []
+        self.errors = {}
+        self.state = {}
+        self.dry_run = dry_run
+
+    @property
+    def changes(self):
+        """The number of writes and deletes"""
+        return len(self.creates) + len(self.updates) + len(self.deletes)
+
+    def __repr__(self):
+        return ('<SyncReport(creates=%r, updates=%r, deletes=%r, '
+                'unchanged=%r, errors=%r)>') % (
+            len(self.creates), len(self.updates), len(self.deletes),
+            self.unchanged, len(self.errors))
+
+
+@asyncio.coroutine
+def sync(store, desired, prefix='', *, state=None, delete=True,
+         dry_run=False, concurrency=10):
+    """Applies a desired state to a generic backend.
+
+    See :meth:`GenericBackend.sync`.
+    """
+    if prefix and not prefix.endswith('/'):
+        prefix += '/'
+    for key in desired:
+        if not key.startswith(prefix) or key.endswith('/'):
+            raise ValueError('%r is not a key under %r' % (key, prefix))
+
+    state = state or {}
+    hashes = digests(desired, prefix)
+    report = SyncReport(dry_run=dry_run)
+
+    def unchanged(path):
+        return path in hashes and state.get(path) == hashes[path]
+
+    def exclude(path):
+        if path.endswith('/') and unchanged(path):
+            report.skipped.append(path)
+            return True
+        return False
+
+    # the remote keys, except for the subtrees known to be up to date
+    remote, keys = set(), Keys(store.list, prefix, exclude=exclude)
+    if not unchanged(prefix):
+        while True:
+            key = yield from keys.next()
+            if key is None:
+                break
+            remote.add(key)
+    else:
+        report.skipped.append(prefix)
+
+    def skipped(key):
+        return any(key.startswith(path) for path in report.skipped)
+
+    candidates = [key for key in sorted(desired) if not skipped(key)]
+    report.creates = [key for key in candidates if key not in remote]
+    if delete:
+        report.deletes = sorted(remote.difference(desired))
+
+    @asyncio.coroutine
+    def read(key):
+        if unchanged(key):
+            return desired[key]
+        result = yield from store.fetch(key, cached=False)
+        return result['data']
+
+    current = yield from run_many(read, [key for key in candidates
+                                         if key in remote],
+                                  concurrency=concurrency)
+    for key, error in current.errors.items():
+        if isinstance(error, KeyError):
+            report.creates.append(key)
+        else:
+            report.errors[key] = error
+    for key, data in current.items():
+        if data == desired[key]:
+            report.unchanged += 1
+        else:
+            report.updates.append(key)
+    report.creates.sort()
+    report.unchanged += len(desired) - len(candidates)
+
+    if dry_run:
+        report.state = dict(state)
+        return report
+
+    @asyncio.coroutine
+    def write(key):
+        yield from store.write(key, desired[key])
+
+    @asyncio.coroutine
+    def remove(key):
+        yield from store.delete(key)
+
+    written = yield from run_many(write, report.creates + report.updates,
+                                  concurrency=concurrency)
+    deleted = yield from run_many(remove, report.deletes,
+                                  concurrency=concurrency)
+    report.errors.update(written.errors)
+    report.errors.update(deleted.errors)
+
+    # a failed key, and its directories, must be checked again next time
+    report.state = hashes
+    for key in report.errors:
+        report.state.pop(key, None)
+        for path in list(report.state):
+            if path.endswith('/') and key.startswith(path):
+                del report.state[path]
+    return report
@@ -0,0 +1,42 @@
+__all__ = ['Timeout']
+
+
+class Timeout:
+    """Bounds the time spent by requests.
+
+    A plain number is understood as a total timeout::
+
+        client = Vault(addr, timeout=Timeout(5, connect=1, read=2))
+        yield from client.read('/secret/foo', timeout=0.5)
+
+    Parameters:
+        total (float): Seconds for the whole call, including retries and
+                       the response body
+        connect (float): Seconds to open a new connection. This one is a
+                         property of the connection pool, and is only
+                         honored client-wide.
+        read (float): Seconds to wait for the response headers, a.k.a.
+                      the time to first byte, for each attempt
+    """
+
+    def __init__(self, total=None, *, connect=None, read=None):
+        self.total = total
+        self.connect = connect
+        self.read = read
+
+    @classmethod
+    def coerce(cls, value):
+        """Returns value as a Timeout
+
+        Parameters:
+            value (obj): A Timeout, a number of seconds or None
+        Returns:
+            Timeout
+        """
+        if isinstance(value, Timeout):
+            return value
+        return cls(value)
+
+    def __repr__(self):
+        return '<Timeout(total=%r, connect=%r, read=%r)>' % (
+            self.total, self.connect, self.read)
@@ -0,0 +1,164 @@
+import os.path
+import ssl
+from .util import no_null
+from aiohttp import ClientSession, TCPConnector
+
+__all__ = ['make_connector', 'make_context', 'Transport']
+
+
+def make_context(cert=None, verify=True):
+    """Creates a SSL context.
+
+    Parameters:
+        cert (tuple): The client certificate and key files
+        verify (bool): Verify the server certificate, or the CA path
+    Returns:
+        SSLContext
+    """
+    ca = verify if isinstance(verify, str) else None
+
+    context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+    context.options |= ssl.OP_NO_SSLv2
+    context.options |= ssl.OP_NO_SSLv3
+    if cert:
+        certfile, keyfile = cert
+        context.load_cert_chain(certfile, keyfile)
+
+    if ca:
+        context.verify_mode = ssl.CERT_REQUIRED
+        if os.path.isdir(ca):
+            context.load_verify_locations(capath=ca)
+        else:
+            context.load_verify_locations(cafile=ca)
+    else:
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def make_connector(addr, cert=None, verify=True, *, context=None,
+                   **options):
+    """Creates a connector suitable for addr.
+
+    The returned connector can be given to many :class:`Request`, which
+    will then share its connection pool.
+
+    Parameters:
+        addr (str): The vault address
+        cert (tuple): The client certificate and key files
+        verify (bool): Verify the server certificate, or the CA path
+        context (SSLContext): Use this context instead of creating one
+        options (dict): Pool options, as accepted by :class:`Request`
+    Returns:
+        TCPConnector
+    """
+    options = no_null(options)
+    if verify:
+        if context is None and (addr.startswith('https://') or cert):
+            context = make_context(cert, verify)
+        return TCPConnector(verify_ssl=True, ssl_context=context, **options)
+    return TCPConnector(verify_ssl=False, **options)
+
+
+class Transport:
+    """Shares connection pools and SSL contexts between many clients.
+
+    SSL contexts are created once per ``(cert, verify)`` couple, so the CA
+    bundle and the client certificate are read only once. Clients that
+    use the same certificates also share the same session and connector,
+    and reuse its kept-alive connections instead of doing new TLS
+    handshakes. Tokens are sent per request, so clients with different
+    tokens can share them safely::
+
+        transport = Transport(limit=100)
+        alice = Vault(addr, token=alice_token, transport=transport)
+        bob = Vault(addr, token=bob_token, transport=transport)
+
+    Parameters:
+        limit (int): The maximum number of simultaneous connections
+        limit_per_host (int): The maximum number of simultaneous
+                              connections to the same endpoint
+        keepalive_timeout (float): How long, in seconds, an idle
+                                   connection is kept open
+        ttl_dns_cache (float): How long, in seconds, resolved addresses
+                               are cached
+        conn_timeout (float): How long, in seconds, opening a connection
+                              may take
+    """
+
+    def __init__(self, *, limit=None, limit_per_host=None,
+                 keepalive_timeout=None, ttl_dns_cache=None,
+                 conn_timeout=None):
+        self.options = no_null({'limit': limit,
+                                'limit_per_host': limit_per_host,
+                                'keepalive_timeout': keepalive_timeout,
+                                'ttl_dns_cache': ttl_dns_cache,
+                                'conn_timeout': conn_timeout})
+        self._contexts = {}
+        self._connectors = {}
+        self._sessions = {}
+
+    def context(self, cert=None, verify=True):
+        """Returns the SSL context for these certificates
+
+        Parameters:
+            cert (tuple): The client certificate and key files
+            verify (bool): Verify the server certificate, or the CA path
+        Returns:
+            SSLContext
+        """
+        key = (tuple(cert) if cert else None), verify
+        if key not in self._contexts:
+            self._contexts[key] = make_context(cert, verify)
+        return self._contexts[key]
+
+    def connector(self, addr, cert=None, verify=True):
+        """Returns the connector to use for addr
+
+        Parameters:
+            addr (str): The vault address
+            cert (tuple): The client certificate and key files
+            verify (bool): Verify the server certificate, or the CA path
+        Returns:
+            TCPConnector
+        """
+        secure = addr.startswith('https://') or bool(cert)
+        key = secure, (tuple(cert) if cert else None), verify
+        connector = self._connectors.get(key)
+        if connector is None or connector.closed:
+            context = None
+            if secure and verify:
+                context = self.context(cert, verify)
+            connector = make_connector(addr, cert, verify,
+                                       context=context,
+                                       **self.options)
+            self._connectors[key] = connector
+        return connector
+
+    def session(self, addr, cert=None, verify=True):
+        """Returns the session to use for addr
+
+        Parameters:
+            addr (str): The vault address
+            cert (tuple): The client certificate and key files
+            verify (bool): Verify the server certificate, or the CA path
+        Returns:
+            ClientSession
+        """
+        connector = self.connector(addr, cert, verify)
+        session = self._sessions.get(connector)
+        if session is None or session.closed:
+            session = ClientSession(connector=connector)
+            self._sessions[connector] = session
+        return session
+
+    def close(self):
+        """Closes all sessions and connectors"""
+        for session in self._sessions.values():
+            session.close()
+        for connector in self._connectors.values():
+            connector.close()
+        self._sessions.clear()
+        self._connectors.clear()
+
+    def __repr__(self):
+        return '<Transport(connectors=%r)>' % len(self._connectors)
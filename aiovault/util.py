@@ -1,10 +1,16 @@
 import asyncio
+import copy
 import inspect
+import logging
 import os.path
 import re
+import sys
 from base64 import b64decode, b64encode
+from binascii import a2b_base64
 from datetime import timedelta
 from functools import partial, wraps
+from .exceptions import RequestTimeout
+from .timeout import Timeout
 
 __all__ = ['convert_duration', 'format_duration', 'format_policies', 'task']
 
@@ -19,6 +25,25 @@ def base64_encode(data):
     return b64encode(data.encode('utf-8')).decode('utf-8')
 
 
+def base64_bytes(data):
+    """Encode a string, or any bytes-like object, using Base64.
+
+    Bytes, bytearrays and memoryviews are accepted as is, and the result is
+    kept as bytes, so that it does not need to be decoded before sending.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    elif isinstance(data, memoryview) and sys.version_info < (3, 4):
+        # base64 only accepts memoryviews since python 3.4
+        data = bytes(data)
+    return b64encode(data)
+
+
+def base64_binary(data):
+    """Decode a Base64 encoded string to bytes"""
+    return a2b_base64(data)
+
+
 def format_duration(obj):
     """Converts obj to consul duration"""
     if obj is None:
@@ -58,8 +83,89 @@ def format_policies(obj):
     return obj
 
 
+@asyncio.coroutine
+def with_timeout(coro, timeout=None, deadline=None, *, loop=None):
+    """Runs coro, bounded by a timeout and a deadline.
+
+    Parameters:
+        coro (coroutine): The coroutine to run
+        timeout (float): The maximum duration, in seconds. For a
+                         :class:`Timeout`, only its total is considered
+        deadline (float): The loop time when coro must be done
+    Raises:
+        RequestTimeout: coro did not complete in time
+    """
+    loop = loop or asyncio.get_event_loop()
+    if isinstance(timeout, Timeout):
+        timeout = timeout.total
+    if deadline is not None:
+        remaining = max(0, deadline - loop.time())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    if timeout is None:
+        result = yield from coro
+        return result
+    try:
+        result = yield from asyncio.wait_for(coro, timeout, loop=loop)
+        return result
+    except RequestTimeout:
+        raise
+    except (asyncio.TimeoutError, TimeoutError) as error:
+        raise RequestTimeout('timed out after %.3fs' % timeout) from error
+
+
+def bounded(args, timeout=None, deadline=None):
+    """Binds timeout and deadline to the request handler of an endpoint.
+
+    Parameters:
+        args (tuple): The arguments of a call, the endpoint first
+        timeout (Timeout): The timeout of the call
+        deadline (float): The loop time when the call must be done
+    Returns:
+        tuple: The arguments, with a bounded copy of the endpoint
+    """
+    if timeout is None and deadline is None:
+        return args
+    if not args or getattr(args[0], 'req_handler', None) is None:
+        return args
+    endpoint = copy.copy(args[0])
+    endpoint.req_handler = endpoint.req_handler.bounded(timeout, deadline)
+    return (endpoint,) + tuple(args[1:])
+
+
+def notify(callback, *args, loop=None):
+    """Calls callback with args, and schedules it if it returns a coroutine.
+
+    Errors raised by the callback are logged, so that a faulty callback
+    cannot stop the caller.
+    """
+    if callback is None:
+        return
+    try:
+        result = callback(*args)
+    except Exception as error:
+        logging.exception(error)
+        return
+    if asyncio.iscoroutine(result):
+        future = asyncio.async(result, loop=loop)
+        future.add_done_callback(log_failure)
+
+
+def log_failure(future):
+    """Logs the error of a finished future, if any"""
+    if future.cancelled() or future.exception() is None:
+        return
+    error = future.exception()
+    logging.error(error, exc_info=(type(error), error, error.__traceback__))
+
+
 def task(func=None, *, loop=None):
-    """Transforms func into an asyncio task."""
+    """Transforms func into an asyncio task.
+
+    The task accepts the extra ``timeout`` and ``deadline`` arguments,
+    which bound its whole execution. See :func:`with_timeout`. When func
+    is a method of an endpoint, each request it sends honors them too,
+    including the ``connect`` and ``read`` parts of a :class:`Timeout`.
+    """
 
     if not func:
         if not loop:
@@ -75,11 +181,21 @@ def task(func=None, *, loop=None):
         @wraps(func)
         def wrapper(self, *arg, **kwargs):
             l = loop or self.loop
-            return asyncio.async(coro(self, *arg, **kwargs), loop=l)
+            timeout = kwargs.pop('timeout', None)
+            deadline = kwargs.pop('deadline', None)
+            self, *arg = bounded((self,) + arg, timeout, deadline)
+            obj = with_timeout(coro(self, *arg, **kwargs),
+                               timeout, deadline, loop=l)
+            return asyncio.async(obj, loop=l)
     else:
         @wraps(func)
         def wrapper(*arg, **kwargs):
-            return asyncio.async(coro(*arg, **kwargs), loop=loop)
+            timeout = kwargs.pop('timeout', None)
+            deadline = kwargs.pop('deadline', None)
+            arg = bounded(arg, timeout, deadline)
+            obj = with_timeout(coro(*arg, **kwargs),
+                               timeout, deadline, loop=loop)
+            return asyncio.async(obj, loop=loop)
     wrapper._is_task = True
     return wrapper
 
@@ -110,6 +226,10 @@ class lazy_property:
         return self
 
 
+def no_null(data):
+    return {k: v for k, v in data.items() if v is not None}
+
+
 def ok(response):
     response.close()
     return response.status == 204
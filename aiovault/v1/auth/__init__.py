@@ -4,14 +4,20 @@
 
 """
 
+import asyncio
+import copy
+import itertools
+import random
+import time
 from .backends import load_backend
 from collections.abc import Mapping
+from aiovault.batch import Ordered, Results
 from aiovault.exceptions import BadToken, InvalidPath
 from aiovault.token import ReadToken, LoginToken
-from aiovault.util import extract_name, extract_id
-from aiovault.util import ok, task, Path, format_duration
+from aiovault.util import convert_duration, extract_name, extract_id
+from aiovault.util import ok, task, Path, format_duration, notify
 
-__all__ = ['authenticate', 'AuthEndpoint', 'AuthCollection']
+__all__ = ['authenticate', 'AuthEndpoint', 'AuthCollection', 'TokenManager']
 
 
 class AuthEndpoint:
@@ -151,45 +157,130 @@ class AuthEndpoint:
         return LoginToken(**result)
 
     @task
-    def lookup_self(self):
+    def create_many(self, specs, *, concurrency=10):
+        """Creates many tokens, with bounded parallelism.
+
+        The requests are pipelined over the connections of the client.
+        Specs are pulled only when there is room for them, so that they
+        can come from a generator::
+
+            specs = ({'policies': ['job'], 'lease': '1h'} for job in jobs)
+            tokens = yield from client.auth.create_many(specs)
+            for index, error in tokens.errors.items():
+                ...
+
+        A token that fails does not stop the others.
+
+        Parameters:
+            specs (iterable): The arguments of :meth:`create`, one dict per
+                              token. May be an async iterator
+            concurrency (int): The maximum number of requests in flight
+        Returns:
+            Results: The tokens by position of their spec, and the errors
+                     by position. Both are in the order of the specs
+        """
+        stream = Ordered(lambda spec: self.create(**spec), specs,
+                         concurrency=concurrency)
+        results = Results()
+        try:
+            for index in itertools.count():
+                outcome = yield from stream.next()
+                if outcome is None:
+                    return results
+                if outcome.error is None:
+                    results[index] = outcome.value
+                else:
+                    results.errors[index] = outcome.error
+        finally:
+            stream.close()
+
+    @property
+    def lookup_cache(self):
+        return getattr(self.req_handler, 'lookup_cache', None)
+
+    @task
+    def lookup_self(self, *, cached=True):
         """Returns information about the current client token.
 
+        Parameters:
+            cached (bool): Use the lookup cache of the client, if any
         Returns:
             ReadToken: The current client token
         """
-        method = 'GET'
         path = self.token_path('lookup-self')
 
-        response = yield from self.req_handler(method, path)
-        result = yield from response.json()
+        result = yield from self.fetch(path, self.req_handler.token,
+                                       cached=cached)
         return ReadToken(**result)
 
     @task
-    def lookup(self, token):
+    def lookup(self, token, *, cached=True):
         """Returns information about a client token.
 
         Parameters:
             token (str): The token ID
+            cached (bool): Use the lookup cache of the client, if any
         Returns:
             ReadToken: The client token
         """
         token = extract_id(token)
-        method = 'GET'
         path = self.token_path('lookup', token)
 
         try:
-            response = yield from self.req_handler(method, path)
-            result = yield from response.json()
+            result = yield from self.fetch(path, token, cached=cached)
             return ReadToken(**result)
         except (InvalidPath, BadToken):
             raise KeyError('%r does not exists' % token)
 
+    @asyncio.coroutine
+    def fetch(self, path, token, *, cached=True):
+        """Returns the raw response body of a lookup.
+
+        Lookups are cached by token id and client token, until the token
+        expires or the cache ttl is reached, whichever comes first.
+        """
+        method = 'GET'
+        cache = self.lookup_cache if cached and token else None
+        entry = (token, self.req_handler.token)
+
+        if cache is not None:
+            result = cache.get(entry)
+            if result is not None:
+                return copy.deepcopy(result)
+
+        response = yield from self.req_handler(method, path)
+        result = yield from response.json()
+
+        if cache is not None:
+            cache.set(entry, copy.deepcopy(result),
+                      ttl=remaining_ttl(result['data']))
+        return result
+
+    def forget(self, token=None):
+        """Drops the cached lookups of a token, or all of them.
+
+        Revocations made by this client already drop them. This is meant
+        for tokens revoked elsewhere.
+
+        Parameters:
+            token (str): The token ID
+        """
+        cache = self.lookup_cache
+        if cache is None:
+            return
+        if token is None:
+            cache.clear()
+        else:
+            token = extract_id(token)
+            cache.invalidate(lambda entry: entry[0] == token)
+
     @task
     def revoke(self, token):
         """Revokes a token and all child tokens.
 
         When the token is revoked, all secrets generated with it are also
-        revoked.
+        revoked. The cached lookups are all dropped, as the child tokens
+        are not known.
 
         Parameters:
             token (str): The token ID
@@ -199,6 +290,7 @@ class AuthEndpoint:
         path = self.token_path('revoke', token)
 
         response = yield from self.req_handler(method, path)
+        self.forget()
         result = yield from response.json()
         return result
 
@@ -218,6 +310,7 @@ class AuthEndpoint:
         path = self.token_path('revoke-orphan', token)
 
         response = yield from self.req_handler(method, path)
+        self.forget(token)
         result = yield from response.json()
         return result
 
@@ -226,7 +319,7 @@ class AuthEndpoint:
         """Revokes all tokens generated at a given prefix, along with child
         tokens, and all secrets generated using those tokens. Uses include
         revoking all tokens generated by a credential backend during a
-        suspected compromise.
+        suspected compromise. The cached lookups are all dropped.
 
         Parameters:
             token (str): The token ID
@@ -235,6 +328,7 @@ class AuthEndpoint:
         path = self.token_path('revoke-prefix', prefix)
 
         response = yield from self.req_handler(method, path)
+        self.forget()
         return ok(response)
 
     @task
@@ -257,10 +351,268 @@ class AuthEndpoint:
         data = {'increment': increment}
 
         response = yield from self.req_handler(method, path, json=data)
+        self.forget(token)
         result = yield from response.json()
         return LoginToken(**result)
 
 
+def remaining_ttl(data):
+    """Returns the seconds before a looked up token expires, if it does"""
+    ttl = data.get('ttl')
+    if ttl is None and data.get('creation_ttl'):
+        ttl = data['creation_time'] + data['creation_ttl'] - time.time()
+    return ttl or None
+
+
+class TokenManager:
+    """Keeps the client token alive.
+
+    The token is renewed at a jittered fraction of its lease. When it
+    cannot be renewed anymore, the manager logs in again with the stored
+    credentials, and the client sends the new token::
+
+        manager = client.manage_token(login={'name': 'userpass',
+                                             'username': 'mitchellh',
+                                             'password': 'foo'})
+        yield from manager.start()
+        ...
+        manager.close()
+
+    Requests of the client wait while the token is swapped, at most
+    ``hold`` seconds. A request rejected with :class:`BadToken` is sent
+    once again if the token turns out to be invalid, and a new one could
+    be obtained. Clients returned by ``using`` are not managed.
+
+    Parameters:
+        req_handler (Request): The request handler of the client
+        login (dict): The arguments of :meth:`AuthEndpoint.login`. Without
+                      them, the token is only renewed
+        fraction (float): The part of the lease after which the token is
+                          renewed
+        jitter (float): The spread of the renewal time, as a part of it
+        increment (int): The duration requested for renewals
+        retry (float): Seconds between retries of a failed renewal
+        hold (float): Seconds a request waits for a new token
+        on_login (callable): Called with the token after each login
+        on_failure (callable): Called with the error of a failed renewal
+                               or login
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, req_handler, *, login=None, fraction=2 / 3,
+                 jitter=0.1, increment=None, retry=5, hold=10,
+                 on_login=None, on_failure=None, loop=None):
+        self.req_handler = req_handler
+        self.credentials = dict(login or {})
+        self.fraction = fraction
+        self.jitter = jitter
+        self.increment = increment
+        self.retry = retry
+        self.hold = hold
+        self.on_login = on_login
+        self.on_failure = on_failure
+        self.loop = loop or asyncio.get_event_loop()
+        self.token = None
+        self.expires = None
+        self._handle = None
+        self._refreshing = None
+        self._swap = None
+        self._checks = {}
+
+    def endpoint(self, token):
+        """Returns an endpoint that is not held by the manager"""
+        return AuthEndpoint(self.req_handler.using(token))
+
+    @asyncio.coroutine
+    def start(self, token=None):
+        """Manages the client token, and renews it or logs in.
+
+        Parameters:
+            token (LoginToken): A token just obtained, that is sent as is
+        Returns:
+            LoginToken: The client token
+        """
+        self.req_handler.token_manager = self
+        if token is not None:
+            self.install(token)
+            return token
+        token = yield from self.refresh()
+        return token
+
+    @asyncio.coroutine
+    def refresh(self):
+        """Renews the token, or logs in again when it cannot be renewed.
+
+        A token that is renewed for less than its previous lease, or than
+        the requested increment, is near its max ttl and is replaced too.
+
+        Returns:
+            LoginToken: The client token
+        """
+        token = self.req_handler.token
+        if token and (self.token is None or self.token['renewable']):
+            try:
+                renewed = yield from self.endpoint(token).renew(
+                    token, self.increment)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                if not self.credentials:
+                    raise
+                self.notify(self.on_failure, error)
+            else:
+                duration = renewed['lease_duration']
+                # near its max ttl, a token is renewed for less than asked
+                if not self.credentials or (
+                        renewed['renewable'] and
+                        0 < duration and self.requested() <= duration):
+                    self.install(renewed)
+                    return renewed
+        token = yield from asyncio.shield(self.swap(), loop=self.loop)
+        return token
+
+    def requested(self):
+        """Returns the lease duration that a renewal should obtain"""
+        if self.increment is not None:
+            return convert_duration(self.increment).total_seconds()
+        if self.token is not None:
+            return self.token['lease_duration']
+        return 0
+
+    def swap(self):
+        """Logs in again, once for concurrent callers
+
+        Returns:
+            Future
+        """
+        if self._swap is None:
+            self._swap = asyncio.async(self.login(), loop=self.loop)
+            self._swap.add_done_callback(self._swapped)
+        return self._swap
+
+    def _swapped(self, future):
+        if future is self._swap:
+            self._swap = None
+        if not future.cancelled():
+            future.exception()
+
+    @asyncio.coroutine
+    def login(self):
+        if not self.credentials:
+            raise ValueError('no credentials to log in with')
+        try:
+            token = yield from self.endpoint(None).login(**self.credentials)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self.notify(self.on_failure, error)
+            raise
+        self.install(token)
+        self.notify(self.on_login, token)
+        return token
+
+    def install(self, token):
+        """Sends token, and schedules its renewal"""
+        self.cancel()
+        self.token = token
+        self.req_handler.token = token.id
+        duration = token['lease_duration']
+        now = self.loop.time()
+        self.expires = now + duration if duration else float('inf')
+        if duration:
+            delay = duration * self.fraction
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._handle = self.loop.call_at(min(now + delay, self.expires),
+                                             self._refresh)
+
+    def _refresh(self):
+        self._handle = None
+
+        def refreshed(future):
+            if future is self._refreshing:
+                self._refreshing = None
+            if future.cancelled() or future.exception() is None:
+                return
+            self._handle = self.loop.call_later(self.retry, self._refresh)
+
+        self._refreshing = asyncio.async(self.refresh(), loop=self.loop)
+        self._refreshing.add_done_callback(refreshed)
+
+    @asyncio.coroutine
+    def wait(self):
+        """Holds a request while the token is swapped"""
+        if self._swap is not None:
+            yield from asyncio.wait([self._swap], timeout=self.hold,
+                                    loop=self.loop)
+
+    @asyncio.coroutine
+    def recover(self, token):
+        """Tells if a request rejected with token can be sent again.
+
+        Vault also rejects the tokens that lack a policy, so the token is
+        looked up first, and a new one is obtained only if it is invalid.
+
+        Parameters:
+            token (str): The rejected token
+        Returns:
+            bool
+        """
+        if token != self.req_handler.token:
+            # swapped in the meantime
+            return True
+        if not self.credentials:
+            return False
+        if token not in self._checks:
+            future = asyncio.async(self.check(token), loop=self.loop)
+            future.add_done_callback(lambda f: self._checks.pop(token, None))
+            self._checks[token] = future
+        try:
+            recovered = yield from asyncio.shield(self._checks[token],
+                                                  loop=self.loop)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return False
+        return recovered
+
+    @asyncio.coroutine
+    def check(self, token):
+        try:
+            yield from self.endpoint(token).lookup_self(cached=False)
+        except BadToken:
+            pass
+        else:
+            return False
+        future = self.swap()
+        yield from asyncio.wait([future], timeout=self.hold, loop=self.loop)
+        return (future.done() and not future.cancelled() and
+                future.exception() is None)
+
+    def notify(self, callback, *args):
+        notify(callback, *args, loop=self.loop)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def close(self):
+        """Stops keeping the token alive.
+
+        The client keeps sending the current token.
+        """
+        self.cancel()
+        for future in [self._refreshing, self._swap] + list(
+                self._checks.values()):
+            if future is not None:
+                future.cancel()
+        if self.req_handler.token_manager is self:
+            self.req_handler.token_manager = None
+
+    def __repr__(self):
+        return '<TokenManager(token=%r)>' % self.token
+
+
 class AuthCollection(Mapping):
 
     def __init__(self, backends, req_handler):
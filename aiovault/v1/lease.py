@@ -1,5 +1,10 @@
+import asyncio
+import heapq
+import itertools
+import random
+from aiovault.batch import Results, run_many
 from aiovault.objects import Value
-from aiovault.util import format_duration, ok, task
+from aiovault.util import extract_id, format_duration, notify, ok, task
 
 
 class LeaseEndpoint:
@@ -55,3 +60,236 @@ class LeaseEndpoint:
 
         response = yield from self.req_handler(method, path)
         return ok(response)
+
+    def manager(self, **options):
+        """Returns a manager that keeps leases alive.
+
+        See :class:`LeaseManager`.
+        """
+        return LeaseManager(self, **options)
+
+
+class Lease:
+    """A lease tracked by a :class:`LeaseManager`.
+
+    Attributes:
+        lease_id (str): The lease id
+        duration (int): The last known duration, in seconds
+        renewable (bool): The lease can be renewed
+        expires (float): The loop time when the lease expires
+        renewals (int): The number of successful renewals
+        failures (int): The number of consecutive failed renewals
+        value (Value): The value that holds the lease, if any
+    """
+
+    def __init__(self, lease_id, duration, renewable, expires, value=None):
+        self.lease_id = lease_id
+        self.duration = duration
+        self.renewable = renewable
+        self.expires = expires
+        self.value = value
+        self.renewals = 0
+        self.failures = 0
+        self.version = 0
+
+    def __repr__(self):
+        return '<Lease(lease_id=%r, duration=%r, renewable=%r)>' % (
+            self.lease_id, self.duration, self.renewable)
+
+
+class LeaseManager:
+    """Keeps leases alive in the background.
+
+    Leases are renewed at a jittered fraction of their duration, so that
+    leases obtained together are not renewed at the same moment, and no
+    more than ``concurrency`` renewals are in flight::
+
+        manager = client.lease.manager(on_expire=rotate)
+        credentials = yield from backend.creds('readonly')
+        manager.register(credentials)
+        ...
+        yield from manager.close()
+
+    A failed renewal is retried until the lease expires. Leases that are
+    not renewable are tracked until they expire.
+
+    Parameters:
+        endpoint (LeaseEndpoint): Renews and revokes the leases
+        fraction (float): The part of the duration after which a lease
+                          is renewed
+        jitter (float): The spread of the renewal time, as a part of it
+        concurrency (int): The maximum number of renewals in flight
+        increment (int): The duration requested for renewals
+        retry (float): Seconds between retries of a failed renewal
+        on_renew (callable): Called with the lease after each renewal
+        on_failure (callable): Called with the lease and the error of a
+                               failed renewal
+        on_expire (callable): Called with the lease once it is expired
+        loop (EventLoop): The event loop
+    """
+
+    def __init__(self, endpoint, *, fraction=2 / 3, jitter=0.1,
+                 concurrency=4, increment=None, retry=5, on_renew=None,
+                 on_failure=None, on_expire=None, loop=None):
+        self.endpoint = endpoint
+        self.fraction = fraction
+        self.jitter = jitter
+        self.increment = increment
+        self.retry = retry
+        self.on_renew = on_renew
+        self.on_failure = on_failure
+        self.on_expire = on_expire
+        self.loop = loop or asyncio.get_event_loop()
+        self.semaphore = asyncio.Semaphore(concurrency, loop=self.loop)
+        self.leases = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event(loop=self.loop)
+        self._scheduler = None
+        self._renewals = set()
+
+    def register(self, value, *, duration=None, renewable=None):
+        """Tracks a lease, and starts the manager if needed.
+
+        Parameters:
+            value (Value): A value with a lease, or a lease id
+            duration (int): The lease duration, if value is a lease id
+            renewable (bool): The lease can be renewed, if value is a
+                              lease id
+        Returns:
+            Lease
+        """
+        if isinstance(value, str):
+            lease_id, value = value, None
+        else:
+            lease_id = value.lease_id
+            duration = value.lease_duration if duration is None else duration
+            renewable = value.renewable if renewable is None else renewable
+        if not lease_id:
+            raise ValueError('%r has no lease' % value)
+
+        now = self.loop.time()
+        lease = Lease(lease_id, duration or 0, bool(renewable),
+                      now + (duration or 0), value)
+        self.leases[lease_id] = lease
+        self.schedule(lease, self.renew_at(lease, now))
+        self.start()
+        return lease
+
+    def unregister(self, lease_id):
+        """Stops tracking a lease, without revoking it
+
+        Parameters:
+            lease_id (str): The lease id
+        Returns:
+            Lease
+        """
+        lease = self.leases.pop(extract_id(lease_id), None)
+        if lease:
+            lease.version += 1
+        return lease
+
+    def renew_at(self, lease, now):
+        if not lease.renewable:
+            return lease.expires
+        delay = lease.duration * self.fraction
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(now + delay, lease.expires)
+
+    def schedule(self, lease, when):
+        lease.version += 1
+        heapq.heappush(self._heap, (when, next(self._counter),
+                                    lease.lease_id, lease.version))
+        self._wakeup.set()
+
+    def start(self):
+        """Starts renewing the leases in the background"""
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.async(self.run(), loop=self.loop)
+
+    @asyncio.coroutine
+    def run(self):
+        while True:
+            self._wakeup.clear()
+            delay = None
+            while self._heap:
+                when, _, lease_id, version = self._heap[0]
+                lease = self.leases.get(lease_id)
+                if lease is None or lease.version != version:
+                    heapq.heappop(self._heap)
+                    continue
+                delay = when - self.loop.time()
+                if delay > 0:
+                    break
+                heapq.heappop(self._heap)
+                delay = None
+                yield from self.semaphore.acquire()
+                task = asyncio.async(self.process(lease), loop=self.loop)
+                self._renewals.add(task)
+                task.add_done_callback(self._processed)
+            try:
+                yield from asyncio.wait_for(self._wakeup.wait(), delay,
+                                            loop=self.loop)
+            except asyncio.TimeoutError:
+                pass
+
+    def _processed(self, task):
+        self._renewals.discard(task)
+        self.semaphore.release()
+
+    @asyncio.coroutine
+    def process(self, lease):
+        now = self.loop.time()
+        if now >= lease.expires or not lease.renewable:
+            self.leases.pop(lease.lease_id, None)
+            self.notify(self.on_expire, lease)
+            return
+        try:
+            result = yield from self.endpoint.renew(lease.lease_id,
+                                                    self.increment)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            lease.failures += 1
+            self.notify(self.on_failure, lease, error)
+            if lease.lease_id in self.leases:
+                now = self.loop.time()
+                self.schedule(lease, min(now + self.retry, lease.expires))
+            return
+        now = self.loop.time()
+        lease.duration = result.lease_duration
+        lease.renewable = result.renewable
+        lease.expires = now + result.lease_duration
+        lease.renewals += 1
+        lease.failures = 0
+        self.notify(self.on_renew, lease)
+        if lease.lease_id in self.leases:
+            self.schedule(lease, self.renew_at(lease, now))
+
+    def notify(self, callback, *args):
+        notify(callback, *args, loop=self.loop)
+
+    @task
+    def close(self, *, revoke=True, concurrency=10):
+        """Stops the renewals, and revokes the leases.
+
+        Parameters:
+            revoke (bool): Revoke the tracked leases
+            concurrency (int): The maximum number of revocations in flight
+        Returns:
+            Results: The revoked leases, and the errors by lease id
+        """
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+        for renewal in list(self._renewals):
+            renewal.cancel()
+        leases, self.leases = self.leases, {}
+        self._heap = []
+        if not revoke:
+            return Results()
+        results = yield from run_many(self.endpoint.revoke, list(leases),
+                                      concurrency=concurrency)
+        return results
+
+    def __repr__(self):
+        return '<LeaseManager(leases=%r)>' % len(self.leases)
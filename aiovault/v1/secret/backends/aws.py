@@ -1,7 +1,9 @@
 from .bases import SecretBackend
+from aiovault.credentials import CredentialsPool
 from aiovault.exceptions import InvalidPath
 from aiovault.objects import Value
 from aiovault.util import format_duration, ok, task
+from aiovault.v1.lease import LeaseEndpoint
 
 
 class AWSBackend(SecretBackend):
@@ -163,3 +165,12 @@ class AWSBackend(SecretBackend):
         response = yield from self.req_handler(method, path)
         result = yield from response.json()
         return Value(**result)
+
+    def pool(self, **options):
+        """Returns a pool of credentials minted ahead of time.
+
+        The unused credentials are revoked when the pool is closed.
+        See :class:`aiovault.credentials.CredentialsPool`.
+        """
+        lease = LeaseEndpoint(self.req_handler)
+        return CredentialsPool(self.creds, revoke=lease.revoke, **options)
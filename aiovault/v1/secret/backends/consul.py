@@ -1,4 +1,5 @@
 from .bases import SecretBackend
+from aiovault.credentials import shared_provider
 from aiovault.exceptions import InvalidPath, InvalidRequest
 from aiovault.objects import Value
 from aiovault.util import base64_encode, ok, task, format_duration
@@ -101,3 +102,10 @@ class ConsulBackend(SecretBackend):
         response = yield from self.req_handler(method, path)
         result = yield from response.json()
         return Value(**result)
+
+    def credentials(self, **options):
+        """Returns the provider that caches the tokens of each role.
+
+        See :class:`aiovault.credentials.CredentialsProvider`.
+        """
+        return shared_provider(self, **options)
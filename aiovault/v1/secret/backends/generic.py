@@ -1,8 +1,16 @@
+import asyncio
+import copy
 from .bases import SecretBackend
+from aiovault.batch import Keys, Stream, Walk, pipeline, run_many
 from aiovault.exceptions import InvalidPath
 from aiovault.objects import Value
+from aiovault.snapshot import Reader, Writer
+from aiovault.sync import sync
 from aiovault.util import ok, task
 
+#: marks the keys that are known to be absent
+ABSENT = object()
+
 
 class GenericBackend(SecretBackend):
     """Store arbitrary secrets within the configured physical storage.
@@ -11,8 +19,15 @@ class GenericBackend(SecretBackend):
     The only value that special is the ``lease`` key, which can be provided
     with any key to restrict the lease time of the secret. This is useful to
     ensure clients periodically renew so that key rolling can be time bounded.
+
+    When the client has a cache, reads are kept until their lease expires,
+    and writes or deletes made by the same client invalidate them.
     """
 
+    @property
+    def cache(self):
+        return getattr(self.req_handler, 'cache', None)
+
     @task
     def read(self, key):
         """Reads the value of the key at the given path.
@@ -22,16 +37,238 @@ class GenericBackend(SecretBackend):
         Returns:
             Value: The key value
         """
+        result = yield from self.fetch(key)
+        return Value(**result)
+
+    @asyncio.coroutine
+    def fetch(self, key, *, cached=True):
+        """Returns the raw response body of a read"""
         method = 'GET'
         path = self.path(key)
+        cache = self.cache if cached else None
+        entry = (path, self.req_handler.token)
+
+        if cache is not None:
+            result = cache.get(entry)
+            if result is ABSENT:
+                raise KeyError('%r does not exists' % key)
+            if result is not None:
+                return copy.deepcopy(result)
+            # a write during the read makes its result stale
+            version = cache.version(path)
 
         try:
             response = yield from self.req_handler(method, path)
             result = yield from response.json()
-            return Value(**result)
         except InvalidPath:
+            if cache is not None and cache.version(path) == version:
+                cache.set(entry, ABSENT, ttl=cache.negative_ttl)
             raise KeyError('%r does not exists' % key)
 
+        if cache is not None and cache.version(path) == version:
+            cache.set(entry, copy.deepcopy(result),
+                      ttl=result.get('lease_duration') or None)
+        return result
+
+    @task
+    def read_many(self, keys, *, concurrency=10):
+        """Reads many keys, with bounded parallelism.
+
+        A key that fails does not stop the others::
+
+            values = yield from store.read_many(keys, concurrency=20)
+            for key, error in values.errors.items():
+                log.warning('cannot read %s: %s', key, error)
+
+        Parameters:
+            keys (list): The keys to read
+            concurrency (int): The maximum number of reads in flight
+        Returns:
+            Results: The values by key, and the errors by key
+        """
+        results = yield from run_many(self.read, keys,
+                                      concurrency=concurrency)
+        return results
+
+    def stream_many(self, keys, *, concurrency=10):
+        """Reads many keys, and yields them as they arrive.
+
+        Parameters:
+            keys (iterable): The keys to read
+            concurrency (int): The maximum number of reads in flight
+        Returns:
+            Stream: Yields an :class:`Outcome` for each key
+        """
+        return Stream(self.read, keys, concurrency=concurrency)
+
+    @task
+    def list(self, prefix=''):
+        """Lists the keys under the given prefix.
+
+        Parameters:
+            prefix (str): The directory to list
+        Returns:
+            list: The keys. Sub-directories end with a slash
+        """
+        method = 'GET'
+        path = self.path(prefix)
+        params = {'list': 'true'}
+
+        try:
+            response = yield from self.req_handler(method, path,
+                                                   params=params)
+            result = yield from response.json()
+        except InvalidPath:
+            raise KeyError('%r does not exists' % prefix)
+        return result['data']['keys']
+
+    def walk(self, prefix='', *, concurrency=10):
+        """Walks the keys under prefix, deepest directories first.
+
+        Parameters:
+            prefix (str): The directory to start with
+            concurrency (int): The maximum number of listings in flight
+        Returns:
+            Walk: Yields the path of each directory, with its keys
+        """
+        return Walk(self.list, prefix, concurrency=concurrency)
+
+    @task
+    def export(self, stream, prefix='', *, concurrency=10, compress=False,
+               after=None, checkpoint=None):
+        """Dumps the keys under prefix into a stream.
+
+        Keys are dumped in lexicographic order, one JSON record per line.
+        They are read concurrently, but written in order. With a
+        checkpoint, each record is flushed to the stream before its key
+        is checkpointed, so that an interrupted export can be resumed
+        after the last checkpoint::
+
+            def checkpoint(key):
+                save_state(key, file.tell())
+
+            with open('secrets.ndjson', 'r+b') as file:
+                last_key, size = load_state()
+                file.truncate(size)
+                file.seek(size)
+                yield from store.export(file, after=last_key,
+                                        checkpoint=checkpoint)
+
+        A compressed export cannot be resumed in place, because its gzip
+        member is left unfinished. Resume it into a new file instead. The
+        interrupted file can still be imported, up to its last
+        checkpoint.
+
+        The cache of the client is bypassed.
+
+        Parameters:
+            stream (file): A binary file object
+            prefix (str): The directory to export
+            concurrency (int): The maximum number of reads in flight
+            compress (bool): Compress the output with gzip
+            after (str): Resume after this key
+            checkpoint (callable): Called with each key once flushed
+        Returns:
+            int: The number of exported keys
+        """
+        keys = Keys(self.list, prefix, after=after)
+        writer = Writer(stream, compress=compress)
+        exported = 0
+
+        @asyncio.coroutine
+        def read(key):
+            try:
+                result = yield from self.fetch(key, cached=False)
+            except KeyError:
+                # deleted since it has been listed
+                return None
+            return result['data']
+
+        def dump(key, data):
+            nonlocal exported
+            if data is not None:
+                writer.write(key, data)
+                exported += 1
+            if checkpoint:
+                writer.flush()
+                checkpoint(key)
+
+        with writer:
+            yield from pipeline(keys.next, read, dump,
+                                concurrency=concurrency)
+        return exported
+
+    @task
+    def import_(self, stream, *, concurrency=10, compress=False, skip=0,
+                checkpoint=None):
+        """Loads the keys dumped by :meth:`export`.
+
+        Keys are written concurrently, and the checkpoint receives the
+        number of records that are surely written, which can be skipped
+        to resume an interrupted import.
+
+        Parameters:
+            stream (file): A binary file object
+            concurrency (int): The maximum number of writes in flight
+            compress (bool): The input is compressed with gzip
+            skip (int): The number of records to skip
+            checkpoint (callable): Called with the number of records done
+        Returns:
+            int: The number of imported keys
+        """
+        reader = Reader(stream, compress=compress, skip=skip)
+        done = skip
+
+        @asyncio.coroutine
+        def write(record):
+            key, data = record
+            yield from self.write(key, data)
+
+        def applied(record, result):
+            nonlocal done
+            done += 1
+            if checkpoint:
+                checkpoint(done)
+
+        imported = yield from pipeline(asyncio.coroutine(reader.read),
+                                       write, applied,
+                                       concurrency=concurrency)
+        return imported
+
+    @task
+    def sync(self, desired, prefix='', *, state=None, delete=True,
+             dry_run=False, concurrency=10):
+        """Applies a desired state, with the fewest writes.
+
+        The current values are read with bounded parallelism, and only the
+        keys that are missing or different are written. The keys under
+        prefix that are not desired are deleted. The report tells what
+        changed, or what would change with ``dry_run``::
+
+            report = yield from store.sync(desired, 'apps/', state=state)
+            state = report.state
+
+        The report state holds the content hashes of the keys and of their
+        directories. Given back to the next sync, it allows to skip the
+        subtrees that did not change since, without reading them. Changes
+        made by other clients in the meantime are not detected; pass no
+        state to check everything.
+
+        Parameters:
+            desired (dict): The data by key. Keys must be under prefix
+            prefix (str): The directory to sync
+            state (dict): The state of the previous sync
+            delete (bool): Delete the keys that are not desired
+            dry_run (bool): Only report the changes
+            concurrency (int): The maximum number of requests in flight
+        Returns:
+            SyncReport
+        """
+        report = yield from sync(self, desired, prefix, state=state,
+                                 delete=delete, dry_run=dry_run,
+                                 concurrency=concurrency)
+        return report
+
     @task
     def write(self, key, values):
         """Update the value of the key at the given path.
@@ -48,7 +285,9 @@ class GenericBackend(SecretBackend):
         path = self.path(key)
         data = values
 
+        self.invalidate(path)
         response = yield from self.req_handler(method, path, json=data)
+        self.invalidate(path)
         return ok(response)
 
     @task
@@ -63,5 +302,13 @@ class GenericBackend(SecretBackend):
         method = 'DELETE'
         path = self.path(key)
 
+        self.invalidate(path)
         response = yield from self.req_handler(method, path)
+        self.invalidate(path)
         return ok(response)
+
+    def invalidate(self, path):
+        """Drops the cached reads of path, whatever their token"""
+        if self.cache is not None:
+            self.cache.bump(path)
+            self.cache.invalidate(lambda entry: entry[0] == path)
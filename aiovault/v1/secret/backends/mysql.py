@@ -1,4 +1,5 @@
 from .bases import SecretBackend
+from aiovault.credentials import shared_provider
 from aiovault.exceptions import InvalidPath
 from aiovault.objects import Value
 from aiovault.util import format_duration, ok, task
@@ -157,3 +158,10 @@ class MySQLBackend(SecretBackend):
         response = yield from self.req_handler(method, path)
         result = yield from response.json()
         return Value(**result)
+
+    def credentials(self, **options):
+        """Returns a provider that caches the credentials of each role.
+
+        See :class:`aiovault.credentials.CredentialsProvider`.
+        """
+        return shared_provider(self, **options)
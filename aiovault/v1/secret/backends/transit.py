@@ -1,10 +1,23 @@
+import asyncio
 from .bases import SecretBackend
+from aiovault.batch import Ordered, pipeline
+from aiovault.envelope import Envelope
 from aiovault.exceptions import InvalidPath, InvalidRequest
 from aiovault.objects import Value
-from aiovault.util import base64_encode, base64_decode, ok, task
+from aiovault.util import base64_binary, base64_bytes, base64_encode
+from aiovault.util import ok, task
 
 
 class TransitBackend(SecretBackend):
+    """Handles cryptographic functions on data in-transit.
+
+    When the client has a decrypt cache, the plaintexts of the transit keys
+    it enables are kept for a short while.
+    """
+
+    @property
+    def decrypt_cache(self):
+        return getattr(self.req_handler, 'decrypt_cache', None)
 
     @task
     def read_key(self, name):
@@ -85,15 +98,22 @@ class TransitBackend(SecretBackend):
         path = self.path('keys', name)
 
         response = yield from self.req_handler(method, path)
+        if self.decrypt_cache is not None:
+            prefix = self.path('decrypt', name)
+            self.decrypt_cache.invalidate(lambda entry: entry[0] == prefix)
         return ok(response)
 
     @task
     def encrypt(self, key, plaintext, context=None):
         """Encrypts the provided plaintext using the named key.
 
+        Binary plaintexts are sent as they are, without being decoded,
+        and the request body is built without intermediate strings.
+
         Parameters:
             key (str): The transit key
-            plaintext (str): The plaintext to encrypt
+            plaintext (str): The plaintext to encrypt. May be bytes,
+                             a bytearray or a memoryview
             context (str): Context for key derivation. Required for
                            derived keys.
         Returns:
@@ -101,18 +121,23 @@ class TransitBackend(SecretBackend):
         """
         method = 'POST'
         path = self.path('encrypt', key)
-        data = {'plaintext': base64_encode(plaintext),
-                'context': base64_encode(context) if context else None}
+        body = [b'{"plaintext":"', base64_bytes(plaintext), b'"']
+        if context:
+            body.extend([b',"context":"', base64_bytes(context), b'"'])
+        body.append(b'}')
+        headers = {'Content-Type': 'application/json'}
 
         try:
-            response = yield from self.req_handler(method, path, json=data)
+            response = yield from self.req_handler(method, path,
+                                                   data=b''.join(body),
+                                                   headers=headers)
             result = yield from response.json()
             return Value(**result)
         except InvalidRequest as error:
             raise ValueError(error.errors.pop())
 
     @task
-    def decrypt(self, key, ciphertext, context=None):
+    def decrypt(self, key, ciphertext, context=None, *, binary=False):
         """Decrypts the provided ciphertext using the named key.
 
         Parameters:
@@ -121,13 +146,34 @@ class TransitBackend(SecretBackend):
                               provided as returned by encrypt.
             context (bool): Context for key derivation. Required for
                             derived keys.
+            binary (bool): Returns the plaintext as bytes, instead of
+                           decoding it as utf-8
         Returns:
             Value
         """
         method = 'POST'
         path = self.path('decrypt', key)
+        if isinstance(ciphertext, (bytes, bytearray, memoryview)):
+            ciphertext = str(ciphertext, 'ascii')
+        if isinstance(context, (bytes, bytearray, memoryview)):
+            context = base64_bytes(context).decode('ascii')
+        elif context:
+            context = base64_encode(context)
         data = {'ciphertext': ciphertext,
-                'context': base64_encode(context) if context else None}
+                'context': context}
+
+        cache = self.decrypt_cache
+        if cache is not None and cache.enabled(key):
+            entry = (path, key, ciphertext, context, self.req_handler.token)
+            plaintext = cache.get(entry)
+            if plaintext is not None:
+                plaintext = bytes(plaintext)
+                if not binary:
+                    plaintext = plaintext.decode('utf-8')
+                return Value(lease_duration=0, auth=None, renewable=False,
+                             lease_id='', data={'plaintext': plaintext})
+        else:
+            cache = None
 
         try:
             response = yield from self.req_handler(method, path, json=data)
@@ -135,5 +181,157 @@ class TransitBackend(SecretBackend):
         except InvalidRequest as error:
             raise ValueError(error.errors.pop())
         result = Value(**result)
-        result['plaintext'] = base64_decode(result['plaintext'])
+        plaintext = base64_binary(result['plaintext'])
+        if cache is not None:
+            cache.set(entry, bytearray(plaintext))
+        if not binary:
+            plaintext = plaintext.decode('utf-8')
+        result['plaintext'] = plaintext
         return result
+
+    @task
+    def datakey(self, key, *, plaintext=True, context=None, bits=256):
+        """Generates a new data key, wrapped by the named key.
+
+        The wrapped key can be stored along with the data, and unwrapped
+        later with :meth:`decrypt` and ``binary=True``.
+
+        Parameters:
+            key (str): The transit key
+            plaintext (bool): Returns the plaintext of the data key too
+            context (str): Context for key derivation. Required for
+                           derived keys.
+            bits (int): The size of the data key
+        Returns:
+            Value: The wrapped key as ``ciphertext``, and its bytes as
+                   ``plaintext``
+        """
+        method = 'POST'
+        kind = 'plaintext' if plaintext else 'wrapped'
+        path = self.path('datakey', kind, key)
+        data = {'context': base64_encode(context) if context else None,
+                'bits': bits}
+
+        try:
+            response = yield from self.req_handler(method, path, json=data)
+            result = yield from response.json()
+        except InvalidRequest as error:
+            raise ValueError(error.errors.pop())
+        result = Value(**result)
+        if 'plaintext' in result:
+            result['plaintext'] = base64_binary(result['plaintext'])
+        return result
+
+    def envelope(self, key, *, context=None, chunk_size=65536,
+                 concurrency=4, executor=None):
+        """Returns an envelope, that encrypts large files locally.
+
+        See :class:`aiovault.envelope.Envelope`.
+        """
+        return Envelope(self, key, context=context, chunk_size=chunk_size,
+                        concurrency=concurrency, executor=executor)
+
+    @task
+    def encrypt_many(self, key, plaintexts, *, context=None,
+                     concurrency=10):
+        """Encrypts many plaintexts, with bounded parallelism.
+
+        The requests are pipelined over the connections of the client,
+        and the first failure stops the batch::
+
+            ciphertexts = yield from backend.encrypt_many('foo', rows)
+
+        Parameters:
+            key (str): The transit key
+            plaintexts (iterable): The plaintexts, or (plaintext, context)
+                                   pairs. May be an async iterator
+            context (str): Context for key derivation, for the plaintexts
+                           that come without
+            concurrency (int): The maximum number of requests in flight
+        Returns:
+            list: The ciphertexts, in the order of the plaintexts
+        """
+        ciphertexts = []
+        yield from pipeline(plaintexts, self.encryptor(key, context),
+                            lambda item, result: ciphertexts.append(result),
+                            concurrency=concurrency)
+        return ciphertexts
+
+    @task
+    def decrypt_many(self, key, ciphertexts, *, context=None, binary=False,
+                     concurrency=10):
+        """Decrypts many ciphertexts, with bounded parallelism.
+
+        Parameters:
+            key (str): The transit key
+            ciphertexts (iterable): The ciphertexts, or (ciphertext,
+                                    context) pairs. May be an async
+                                    iterator
+            context (str): Context for key derivation, for the ciphertexts
+                           that come without
+            binary (bool): Returns the plaintexts as bytes
+            concurrency (int): The maximum number of requests in flight
+        Returns:
+            list: The plaintexts, in the order of the ciphertexts
+        """
+        plaintexts = []
+        yield from pipeline(ciphertexts,
+                            self.decryptor(key, context, binary=binary),
+                            lambda item, result: plaintexts.append(result),
+                            concurrency=concurrency)
+        return plaintexts
+
+    def encrypt_stream(self, key, plaintexts, *, context=None,
+                       concurrency=10):
+        """Encrypts plaintexts as they come, and yields them in order.
+
+        Parameters:
+            key (str): The transit key
+            plaintexts (iterable): The plaintexts, or (plaintext, context)
+                                   pairs. May be an async iterator
+            context (str): Context for key derivation
+            concurrency (int): The maximum number of requests in flight
+        Returns:
+            Ordered: Yields an :class:`Outcome` by plaintext, whose value
+                     is the ciphertext
+        """
+        return Ordered(self.encryptor(key, context), plaintexts,
+                       concurrency=concurrency)
+
+    def decrypt_stream(self, key, ciphertexts, *, context=None,
+                       binary=False, concurrency=10):
+        """Decrypts ciphertexts as they come, and yields them in order.
+
+        Parameters:
+            key (str): The transit key
+            ciphertexts (iterable): The ciphertexts, or (ciphertext,
+                                    context) pairs. May be an async
+                                    iterator
+            context (str): Context for key derivation
+            binary (bool): Yields the plaintexts as bytes
+            concurrency (int): The maximum number of requests in flight
+        Returns:
+            Ordered: Yields an :class:`Outcome` by ciphertext, whose value
+                     is the plaintext
+        """
+        return Ordered(self.decryptor(key, context, binary=binary),
+                       ciphertexts, concurrency=concurrency)
+
+    def encryptor(self, key, context=None):
+        @asyncio.coroutine
+        def encrypt(item):
+            plaintext, ctx = item if isinstance(item, tuple) else (item,
+                                                                   context)
+            result = yield from self.encrypt(key, plaintext, ctx)
+            return result['ciphertext']
+        return encrypt
+
+    def decryptor(self, key, context=None, *, binary=False):
+        @asyncio.coroutine
+        def decrypt(item):
+            ciphertext, ctx = item if isinstance(item, tuple) else (item,
+                                                                    context)
+            result = yield from self.decrypt(key, ciphertext, ctx,
+                                             binary=binary)
+            return result['plaintext']
+        return decrypt
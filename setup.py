@@ -32,11 +32,12 @@ setup(
         'Topic :: System :: Networking :: Monitoring',
     ],
     install_requires=[
-        'aiohttp>=0.15.2',
+        'aiohttp>=0.21',
         'stevedore>=0.9'
     ],
     extras_require={
         ':python_version=="3.3"': ['asyncio'],
+        'envelope': ['cryptography>=2.0'],
     },
     entry_points={
         'aiovault.audit.backend': [
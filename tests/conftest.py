@@ -12,6 +12,10 @@ from collections.abc import Mapping
 from functools import wraps
 from subprocess import Popen, PIPE
 from time import sleep
+from aiovault import Vault as Client
+from aiovault.exceptions import DownError, InvalidPath
+from aiovault.request import Request
+from aiovault.util import with_timeout
 
 __tracebackhide__ = True
 
@@ -278,6 +282,104 @@ def consul(request):
     return server.config
 
 
+class Response:
+    """Mimics the response of vault, with a JSON body"""
+
+    def __init__(self, data=None):
+        self.status = 204 if data is None else 200
+        self.headers = {'Content-Type': 'application/json'}
+        self.data = data
+
+    @asyncio.coroutine
+    def read(self):
+        return b'' if self.data is None else json.dumps(self.data).encode()
+
+    @asyncio.coroutine
+    def json(self):
+        return self.data
+
+    def close(self):
+        pass
+
+
+class FakeVault:
+    """Mimics the nodes of a vault cluster.
+
+    Requests are routed to handlers by path prefix. A handler is called
+    with the method, the path, the token and the body of a request, and
+    returns the JSON body of the response, or raises an HTTPError.
+    """
+
+    def __init__(self, nodes=('http://node1:8200',), *, leader=None,
+                 down=(), healthy=True):
+        self.nodes = list(nodes)
+        self.leader = leader or self.nodes[0]
+        self.down = set(down)
+        self.healthy = healthy
+        self.routes = []
+        self.requests = []
+        self.leader_calls = []
+        self.probes = 0
+
+    def route(self, prefix, handler):
+        self.routes.append((prefix, handler))
+
+    @asyncio.coroutine
+    def fetch_leader(self, addr):
+        self.leader_calls.append(addr)
+        if addr in self.down:
+            raise DownError({'errors': []})
+        return {'ha_enabled': True,
+                'is_self': addr == self.leader,
+                'leader_address': self.leader}
+
+    @asyncio.coroutine
+    def probe(self, addr):
+        self.probes += 1
+        yield from asyncio.sleep(0)
+        if not self.healthy:
+            raise DownError({'errors': []})
+        return {'initialized': True, 'sealed': False, 'standby': False}
+
+    @asyncio.coroutine
+    def send(self, method, path, *, token=None, data=None):
+        self.requests.append((method, path))
+        for prefix, handler in self.routes:
+            if path.startswith(prefix):
+                result = handler(method, path, token, data)
+                if asyncio.iscoroutine(result):
+                    result = yield from result
+                return Response(result)
+        raise InvalidPath({'errors': []})
+
+
+class FakeHandler(Request):
+    """A request handler that sends its requests to a FakeVault"""
+
+    def __init__(self, vault, **options):
+        super().__init__(vault.nodes[0], 'v1', **options)
+        self.vault = vault
+
+    @asyncio.coroutine
+    def send(self, method, url, *, timeout=None, **kwargs):
+        path = url.split('/' + self.version, 1)[1]
+        token = (kwargs.get('headers') or {}).get('X-Vault-Token')
+        data = kwargs.get('data')
+        if isinstance(data, str):
+            data = json.loads(data)
+        response = yield from with_timeout(
+            self.vault.send(method, path, token=token, data=data), timeout)
+        return response
+
+
+def fake_client(vault, **options):
+    """Returns a client of a FakeVault"""
+    client = Client(vault.nodes[0])
+    client.close()
+    client.req_handler = FakeHandler(vault, **options)
+    return client
+
+
 @pytest.fixture(scope='function', autouse=False)
 def dev_server(request):
     server = Vault('dev')
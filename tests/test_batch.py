@@ -0,0 +1,162 @@
+import asyncio
+from aiovault.batch import Keys, Ordered, Stream, Walk, pipeline, run_many
+from conftest import async_test
+
+
+@async_test
+def test_run_many():
+    running, peak = 0, 0
+
+    @asyncio.coroutine
+    def double(key):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        yield from asyncio.sleep(0.01 * (key % 3))
+        running -= 1
+        if key == 4:
+            raise KeyError(key)
+        return key * 2
+
+    results = yield from run_many(double, range(10), concurrency=3)
+    assert peak == 3
+    assert list(results) == [0, 1, 2, 3, 5, 6, 7, 8, 9]
+    assert results[9] == 18
+    assert isinstance(results.errors[4], KeyError)
+
+
+@async_test
+def test_stream():
+    # each call completes once its key is released
+    released = {key: asyncio.Event() for key in [3, 1, 2]}
+
+    @asyncio.coroutine
+    def identity(key):
+        yield from released[key].wait()
+        return key
+
+    stream = Stream(identity, [3, 1, 2], concurrency=3)
+    keys = []
+    for key in [1, 2, 3]:
+        released[key].set()
+        outcome = yield from stream.next()
+        assert outcome.error is None
+        keys.append(outcome.value)
+    assert keys == [1, 2, 3]
+    outcome = yield from stream.next()
+    assert outcome is None
+
+
+@async_test
+def test_walk():
+    tree = {'': ['a/', 'b/', 'c'],
+            'a/': ['d/', 'e'],
+            'a/d/': ['f'],
+            'b/': ['g/']}
+
+    @asyncio.coroutine
+    def listing(path):
+        yield from asyncio.sleep(0)
+        return tree[path]
+
+    walk = Walk(listing, concurrency=2)
+    paths = []
+    while True:
+        entry = yield from walk.next()
+        if entry is None:
+            break
+        paths.append(entry[0])
+    assert paths[0] == ''
+    assert sorted(paths) == ['', 'a/', 'a/d/', 'b/'], 'b/g/ vanished'
+    assert paths.index('a/') < paths.index('a/d/')
+
+
+@async_test
+def test_walk_memory():
+    peak = 0
+
+    @asyncio.coroutine
+    def listing(path):
+        nonlocal peak
+        peak = max(peak, len(walk.pending))
+        yield from asyncio.sleep(0)
+        if path.count('/') == 3:
+            return ['key']
+        return ['%s/' % i for i in range(10)]
+
+    walk = Walk(listing, concurrency=2)
+    count = 0
+    while True:
+        entry = yield from walk.next()
+        if entry is None:
+            break
+        count += 1
+    assert count == 1 + 10 + 100 + 1000
+    assert peak <= 3 * 10 + 2 * 10, 'the widest level has 1000 dirs'
+
+
+@async_test
+def test_keys():
+    tree = {'': ['b', 'a/', 'a-b'],
+            'a/': ['d/', 'c'],
+            'a/d/': ['e']}
+
+    @asyncio.coroutine
+    def listing(path):
+        return tree[path]
+
+    @asyncio.coroutine
+    def collect(keys):
+        found = []
+        while True:
+            key = yield from keys.next()
+            if key is None:
+                return found
+            found.append(key)
+
+    found = yield from collect(Keys(listing))
+    assert found == ['a-b', 'a/c', 'a/d/e', 'b']
+    assert found == sorted(found)
+    found = yield from collect(Keys(listing, after='a/c'))
+    assert found == ['a/d/e', 'b']
+
+
+@async_test
+def test_pipeline():
+    items = iter(range(6))
+    results = []
+
+    @asyncio.coroutine
+    def source():
+        return next(items, None)
+
+    @asyncio.coroutine
+    def square(item):
+        yield from asyncio.sleep(0.01 * (6 - item))
+        return item * item
+
+    def sink(item, result):
+        results.append(result)
+
+    count = yield from pipeline(source, square, sink, concurrency=3)
+    assert count == 6
+    assert results == [0, 1, 4, 9, 16, 25]
+
+
+@async_test
+def test_ordered():
+    @asyncio.coroutine
+    def invert(item):
+        yield from asyncio.sleep(0.01 * (3 - item))
+        return 1 / item
+
+    stream = Ordered(invert, [1, 2, 0, 3], concurrency=2)
+    outcomes = []
+    while True:
+        outcome = yield from stream.next()
+        if outcome is None:
+            break
+        outcomes.append(outcome)
+    assert [outcome.key for outcome in outcomes] == [1, 2, 0, 3]
+    assert outcomes[1].value == 0.5
+    assert isinstance(outcomes[2].error, ZeroDivisionError)
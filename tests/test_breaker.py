@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from aiovault import CircuitBreaker, CircuitOpen
+from aiovault.breaker import CLOSED, OPEN
+from aiovault.exceptions import DownError, InvalidPath
+from aiovault.routing import Router
+from conftest import FakeHandler, FakeVault, async_test
+
+NODE = 'http://node1:8200'
+
+
+def test_trips():
+    breaker = CircuitBreaker()
+    assert breaker.trips(DownError({'errors': []}))
+    assert breaker.trips(asyncio.TimeoutError())
+    assert not breaker.trips(InvalidPath({'errors': []}))
+    assert not breaker.trips(CircuitOpen({'errors': []}))
+
+
+@async_test
+def test_open():
+    node = FakeVault([NODE], healthy=False)
+    breaker = CircuitBreaker(threshold=2, recovery=60)
+
+    breaker.failure(NODE)
+    assert breaker.state(NODE) == CLOSED
+    yield from breaker.check(NODE, node.probe)
+
+    breaker.failure(NODE)
+    assert breaker.state(NODE) == OPEN
+    assert breaker.states() == {NODE: OPEN}
+    assert breaker.opened() == {NODE}
+
+    with pytest.raises(CircuitOpen):
+        yield from breaker.check(NODE, node.probe)
+    assert node.probes == 0
+
+
+@async_test
+def test_recovery():
+    node = FakeVault([NODE], healthy=False)
+    breaker = CircuitBreaker(threshold=1, recovery=0)
+    breaker.failure(NODE)
+
+    with pytest.raises(CircuitOpen):
+        yield from breaker.check(NODE, node.probe)
+    assert node.probes == 1
+    assert breaker.state(NODE) == OPEN
+
+    node.healthy = True
+    yield from asyncio.gather(*[
+        breaker.check(NODE, node.probe) for i in range(5)
+    ])
+    assert node.probes == 2, 'a single probe must be sent'
+    assert breaker.state(NODE) == CLOSED
+
+
+def test_success():
+    breaker = CircuitBreaker(threshold=2)
+    breaker.failure(NODE)
+    breaker.success(NODE)
+    breaker.failure(NODE)
+    assert breaker.state(NODE) == CLOSED
+
+
+@async_test
+def test_open_keeps_leader():
+    vault = FakeVault([NODE, 'http://node2:8200'])
+
+    def down(method, path, token, data):
+        raise DownError({'errors': []})
+
+    vault.route('/sys/leader', lambda *args: {
+        'ha_enabled': True, 'is_self': True, 'leader_address': NODE})
+    vault.route('/secret/', down)
+    handler = FakeHandler(vault, breaker=CircuitBreaker(threshold=1,
+                                                        recovery=60))
+    handler.router = Router(vault.nodes, ttl=60)
+
+    with pytest.raises(DownError):
+        yield from handler('GET', '/secret/foo')
+    for _ in range(4):
+        with pytest.raises(CircuitOpen):
+            yield from handler('GET', '/secret/foo')
+    lookups = [path for method, path in vault.requests
+               if path == '/sys/leader']
+    assert len(lookups) == 2, 'discovered again once, after the failure'
+    handler.close()
@@ -0,0 +1,68 @@
+import time
+from aiovault import LRUCache, PlaintextCache
+
+
+def test_lru():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert 'b' not in cache, 'b is the least recently used'
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats.evictions == 1
+
+
+def test_ttl():
+    cache = LRUCache(ttl=60)
+    cache.set('a', 1, ttl=0.01)
+    cache.set('b', 2, ttl=3600)
+    cache.set('c', 3, ttl=0)
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    assert cache.get('c') is None
+    assert cache.stats.expirations == 1
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+
+
+def test_invalidate():
+    cache = LRUCache()
+    cache.set(('/secret/foo', 'token1'), 1)
+    cache.set(('/secret/foo', 'token2'), 2)
+    cache.set(('/secret/bar', 'token1'), 3)
+
+    cache.invalidate(lambda key: key[0] == '/secret/foo')
+    assert len(cache) == 1
+    cache.pop(('/secret/bar', 'token1'))
+    assert len(cache) == 0
+
+
+def test_zeroize():
+    cache = PlaintextCache(keys=['foo'], maxsize=1)
+    first, second = bytearray(b'secret'), bytearray(b'other')
+    cache.set(('/transit/decrypt/foo', 'foo', 'c1', None, None), first)
+    cache.set(('/transit/decrypt/foo', 'foo', 'c2', None, None), second)
+    assert first == bytes(6), 'evicted entry is wiped'
+
+    cache.disable('foo')
+    assert not cache.enabled('foo')
+    assert second == bytes(5)
+    assert len(cache) == 0
+
+
+def test_versions():
+    cache = LRUCache(maxsize=2)
+    version = cache.version('foo')
+    cache.bump('foo')
+    assert cache.version('foo') != version
+
+    version = cache.version('bar')
+    cache.bump('bar')
+    cache.bump('baz')
+    cache.bump('qux')
+    assert cache.version('bar') != version, 'forgotten tags stay changed'
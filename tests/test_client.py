@@ -1,6 +1,7 @@
 import pytest
-from aiovault import MountError, Vault
-from conftest import async_test
+from aiovault import MountError, Transport, Vault
+from aiovault.transport import make_connector
+from conftest import FakeVault, async_test, fake_client
 
 
 @async_test
@@ -84,3 +85,73 @@ def test_secret_mount(dev_server):
     with pytest.raises(MountError):
         # already unmounted
         yield from backend.unmount()
+
+
+def test_pool_options():
+    client = Vault('http://127.0.0.1:8200', limit=3, keepalive_timeout=5)
+    assert client.req_handler.connector.limit == 3
+    client.close()
+
+
+@async_test
+def test_shared_connector(dev_server):
+    connector = make_connector(dev_server.addr, limit=2)
+    client1 = Vault(dev_server.addr,
+                    token=dev_server.root_token,
+                    connector=connector)
+    client2 = Vault(dev_server.addr,
+                    token=dev_server.root_token,
+                    connector=connector)
+
+    backends = yield from client1.secret.items()
+    assert 'secret' in backends
+    backends = yield from client2.secret.items()
+    assert 'secret' in backends
+
+    client1.close()
+    assert not connector.closed
+    backends = yield from client2.secret.items()
+    assert 'secret' in backends
+
+
+def test_connector_session():
+    connector = make_connector('http://127.0.0.1:8200')
+    client = Vault('http://127.0.0.1:8200', connector=connector)
+    client.close()
+    assert client.req_handler.session.closed
+    assert not connector.closed
+    connector.close()
+
+
+def test_transport():
+    transport = Transport(limit=10)
+    client1 = Vault('https://127.0.0.1:8200', token='foo',
+                    transport=transport)
+    client2 = Vault('https://127.0.0.1:8200', token='bar',
+                    transport=transport)
+    client3 = Vault('http://127.0.0.1:8200', token='baz',
+                    transport=transport)
+    assert client1.req_handler.connector is client2.req_handler.connector
+    assert client1.req_handler.connector is not client3.req_handler.connector
+    assert transport.context() is transport.context(None, True)
+
+    client1.close()
+    assert not client2.req_handler.connector.closed
+    transport.close()
+    assert client2.req_handler.connector.closed
+
+
+@async_test
+def test_headers():
+    vault = FakeVault()
+    vault.route('/secret/', lambda method, path, token, data: {'id': token})
+    client = fake_client(vault)
+    headers = {'X-Request-Id': '42'}
+
+    response = yield from client.read('/secret/foo', token='foo',
+                                      headers=headers)
+    assert response.data == {'id': 'foo'}
+    yield from client.write('/secret/foo', token='bar', headers=headers,
+                            json={'value': 'baz'})
+    assert headers == {'X-Request-Id': '42'}
+    client.close()
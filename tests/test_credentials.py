@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from aiovault.credentials import CredentialsPool, CredentialsProvider
+from aiovault.v1 import SecretEndpoint
+from conftest import FakeHandler, FakeVault, async_test
+
+
+def mysql(duration):
+    """Returns a mysql backend, that mints numbered credentials"""
+    vault = FakeVault()
+    vault.minted = 0
+
+    @asyncio.coroutine
+    def creds(method, path, token, data):
+        vault.minted += 1
+        number = vault.minted
+        yield from asyncio.sleep(0.01)
+        return {'lease_id': '%s/%s' % (path.split('/')[-1], number),
+                'lease_duration': duration, 'renewable': True,
+                'auth': None, 'data': {'username': 'user-%s' % number}}
+
+    vault.route('/mysql/creds/', creds)
+    vault.route('/sys/revoke/', lambda *args: None)
+    backend = SecretEndpoint(FakeHandler(vault)).load('mysql')
+    return backend, vault
+
+
+@async_test
+def test_provider():
+    backend, vault = mysql(duration=0.4)
+    revoked = []
+
+    @asyncio.coroutine
+    def revoke(lease_id):
+        revoked.append(lease_id)
+        return True
+
+    # minted again after 0.2s, which leaves wide margins to the checks
+    provider = CredentialsProvider(backend.creds, revoke=revoke,
+                                   fraction=0.5, jitter=0)
+
+    values = yield from asyncio.gather(*[provider.get('ro')
+                                         for i in range(5)])
+    assert vault.minted == 1
+    assert all(value is values[0] for value in values)
+
+    yield from asyncio.sleep(0.3)
+    assert vault.minted == 2, 'refreshed ahead of expiry'
+    value = yield from provider.get('ro')
+    assert value['username'] == 'user-2'
+
+    provider.invalidate('ro')
+    value = yield from provider.get('ro')
+    assert value['username'] == 'user-3'
+
+    assert provider.leases() == ['ro/1', 'ro/2', 'ro/3']
+    yield from asyncio.sleep(0.15)
+    results = yield from provider.close()
+    assert list(results) == ['ro/2', 'ro/3'], 'ro/1 expired'
+    assert revoked == ['ro/2', 'ro/3']
+    backend.req_handler.close()
+
+
+@async_test
+def test_provider_idle():
+    backend, vault = mysql(duration=0.3)
+    # refreshes are due after 0.2s and 0.4s, well before and after the
+    # role has been idle for a whole lease. user-2 expires after 0.5s
+    provider = CredentialsProvider(backend.creds, jitter=0)
+    yield from provider.get('ro')
+    yield from asyncio.sleep(0.7)
+    assert vault.minted == 2, 'refreshed once, then left to expire'
+
+    value = yield from provider.get('ro')
+    assert value['username'] == 'user-3'
+    yield from provider.close(revoke=False)
+    backend.req_handler.close()
+
+
+@async_test
+def test_invalidate_during_refresh():
+    backend, vault = mysql(duration=3600)
+    provider = CredentialsProvider(backend.creds)
+    first = asyncio.async(provider.get('ro'))
+    yield from asyncio.sleep(0)
+    provider.invalidate('ro')
+    value = yield from first
+    assert value['username'] == 'user-1'
+
+    value = yield from provider.get('ro')
+    assert value['username'] == 'user-2', 'user-1 was not cached'
+    value = yield from provider.get('ro')
+    assert value['username'] == 'user-2'
+    assert provider.leases() == ['ro/1', 'ro/2']
+    yield from provider.close(revoke=False)
+    backend.req_handler.close()
+
+
+@async_test
+def test_shared_provider():
+    backend, vault = mysql(duration=0.2)
+    provider = backend.credentials(jitter=0)
+    assert backend.credentials() is provider
+    for i in range(5):
+        yield from provider.get('ro')
+        yield from asyncio.sleep(0.1)
+    assert vault.minted >= 3
+    assert len(provider._leases) <= 2, 'expired leases are pruned'
+
+    results = yield from provider.close()
+    assert not results, 'still used'
+    value = yield from provider.get('ro')
+    assert value.lease_id in provider.leases()
+
+    results = yield from provider.close()
+    assert value.lease_id in results
+    assert ('PUT', '/sys/revoke/%s' % value.lease_id) in vault.requests
+    assert backend.credentials() is not provider
+    backend.req_handler.close()
+
+
+@async_test
+def test_pool():
+    backend, vault = mysql(duration=3600)
+    revoked = []
+
+    @asyncio.coroutine
+    def revoke(lease_id):
+        revoked.append(lease_id)
+        return True
+
+    pool = CredentialsPool(backend.creds, revoke=revoke, size=3,
+                           warmup=0.05)
+    pool.fill('deploy')
+    first = yield from pool.get('deploy')
+    assert vault.minted == 3
+
+    yield from asyncio.sleep(0.1)
+    assert pool.available('deploy') == 3
+    second = yield from pool.get('deploy')
+    assert second['username'] != first['username']
+
+    yield from asyncio.sleep(0.05)
+    results = yield from pool.close()
+    assert len(results) == 3
+    assert len(revoked) == 3
+    backend.req_handler.close()
+
+
+@async_test
+def test_pool_stale():
+    backend, vault = mysql(duration=0.1)
+    revoked = []
+
+    @asyncio.coroutine
+    def revoke(lease_id):
+        revoked.append(lease_id)
+        return True
+
+    pool = CredentialsPool(backend.creds, revoke=revoke, size=2, warmup=0,
+                           min_ttl=0.09)
+    pool.fill('deploy')
+    yield from asyncio.sleep(0.08)
+    assert pool.available('deploy') == 2
+
+    value = yield from pool.get('deploy')
+    assert value['username'] == 'user-3'
+    assert sorted(revoked) == ['deploy/1', 'deploy/2']
+    yield from pool.close()
+    backend.req_handler.close()
+
+
+@async_test
+def test_pool_close():
+    backend, vault = mysql(duration=3600)
+    pool = CredentialsPool(backend.creds, size=1, warmup=0)
+    waiter = asyncio.async(pool.get('deploy'))
+    yield from asyncio.sleep(0)
+    yield from pool.close()
+    with pytest.raises(asyncio.CancelledError):
+        yield from waiter
+    with pytest.raises(asyncio.CancelledError):
+        yield from pool.get('deploy')
+    backend.req_handler.close()
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import os
+import pytest
+from binascii import hexlify, unhexlify
+from conftest import async_test
+
+pytest.importorskip('cryptography')
+
+from aiovault.envelope import Envelope  # noqa
+
+
+class Transit:
+    """Mimics a transit backend, that wraps keys by reversing them"""
+
+    def __init__(self):
+        self.calls = 0
+
+    @asyncio.coroutine
+    def datakey(self, key, *, context=None):
+        self.calls += 1
+        plaintext = os.urandom(32)
+        return {'plaintext': plaintext,
+                'ciphertext': hexlify(plaintext[::-1]).decode()}
+
+    @asyncio.coroutine
+    def decrypt(self, key, ciphertext, context=None, *, binary=False):
+        self.calls += 1
+        return {'plaintext': unhexlify(ciphertext)[::-1]}
+
+
+@async_test
+def test_roundtrip():
+    transit = Transit()
+    envelope = Envelope(transit, 'foo', chunk_size=100)
+    data = os.urandom(1050)
+
+    container = io.BytesIO()
+    chunks = yield from envelope.encrypt(io.BytesIO(data), container)
+    assert chunks == 11
+    assert transit.calls == 1
+
+    output = io.BytesIO()
+    container.seek(0)
+    yield from Envelope(transit, 'foo').decrypt(container, output)
+    assert output.getvalue() == data
+    assert transit.calls == 2
+
+    chunk = yield from envelope.decrypt_chunk(container, 10)
+    assert chunk == data[1000:]
+    with pytest.raises(IndexError):
+        yield from envelope.decrypt_chunk(container, 11)
+
+
+@async_test
+def test_truncated():
+    envelope = Envelope(Transit(), 'foo', chunk_size=100)
+    container = io.BytesIO()
+    yield from envelope.encrypt(io.BytesIO(os.urandom(250)), container)
+
+    truncated = container.getvalue()[:-(50 + 16 + 4)]
+    with pytest.raises(ValueError):
+        yield from envelope.decrypt(io.BytesIO(truncated), io.BytesIO())
+
+
+@async_test
+def test_key_cache():
+    transit = Transit()
+    envelope = Envelope(transit, 'foo', chunk_size=100, cache_size=1)
+    containers = []
+    for _ in range(2):
+        container = io.BytesIO()
+        yield from envelope.encrypt(io.BytesIO(os.urandom(250)), container)
+        containers.append(container)
+    assert len(envelope._ciphers) == 1
+    assert transit.calls == 2
+
+    # the latest key is still cached, the first one has to be unwrapped
+    yield from envelope.decrypt_chunk(containers[1], 0)
+    assert transit.calls == 2
+    yield from envelope.decrypt_chunk(containers[0], 0)
+    assert transit.calls == 3
+
+    envelope = Envelope(transit, 'foo', cache_size=0)
+    yield from envelope.decrypt_chunk(containers[0], 0)
+    yield from envelope.decrypt_chunk(containers[0], 1)
+    assert transit.calls == 5
+    assert len(envelope._ciphers) == 0
@@ -1,5 +1,8 @@
-from aiovault import Vault
-from conftest import async_test
+import asyncio
+import io
+from aiovault import LRUCache, RequestTimeout, Vault
+from aiovault.snapshot import Reader
+from conftest import FakeVault, async_test, fake_client
 import pytest
 
 
@@ -30,3 +33,221 @@ def test_generic(dev_server):
 
     data = yield from store.delete('bar')
     assert data is True
+
+
+@async_test
+def test_coalesce():
+    vault = FakeVault()
+
+    @asyncio.coroutine
+    def read(method, path, token, data):
+        yield from asyncio.sleep(0.1)
+        return {'lease_id': '', 'lease_duration': 0, 'renewable': False,
+                'auth': None, 'data': {'value': 'bar'}}
+
+    vault.route('/secret/', read)
+    client = fake_client(vault, coalesce=True)
+    store = client.secret.load('secret', type='generic')
+
+    results = yield from asyncio.gather(*[
+        store.read('foo') for i in range(20)
+    ])
+    assert vault.requests == [('GET', '/secret/foo')]
+    for data in results:
+        assert data == {'value': 'bar'}
+    assert not client.req_handler._inflight
+
+    # the shared read outlives the caller that started it
+    first = store.read('foo', timeout=0.05)
+    yield from asyncio.sleep(0.01)
+    data = yield from store.read('foo')
+    assert data == {'value': 'bar'}
+    assert len(vault.requests) == 2
+    with pytest.raises(RequestTimeout):
+        yield from first
+    client.close()
+
+
+@async_test
+def test_cache_write_during_read():
+    vault = FakeVault()
+    values = {'foo': 'bar'}
+
+    @asyncio.coroutine
+    def secret(method, path, token, data):
+        if method == 'POST':
+            values.update(data)
+            return None
+        value = values['foo']
+        yield from asyncio.sleep(0.05)
+        return {'lease_id': '', 'lease_duration': 0, 'renewable': False,
+                'auth': None, 'data': {'foo': value}}
+
+    vault.route('/secret/', secret)
+    client = fake_client(vault, cache=LRUCache())
+    store = client.secret.load('secret', type='generic')
+
+    read = store.read('foo')
+    yield from asyncio.sleep(0.01)
+    yield from store.write('foo', {'foo': 'baz'})
+    data = yield from read
+    assert data == {'foo': 'bar'}
+    assert len(client.req_handler.cache) == 0
+
+    data = yield from store.read('foo')
+    assert data == {'foo': 'baz'}
+    data = yield from store.read('foo')
+    assert len(vault.requests) == 3
+    client.close()
+
+
+@async_test
+def test_cache(dev_server):
+    client = Vault(dev_server.addr,
+                   token=dev_server.root_token,
+                   cache=LRUCache(negative_ttl=60))
+    store = client.secret.load('secret', type='generic')
+    stats = client.req_handler.cache.stats
+
+    yield from store.write('foo', {'value': 'bar'})
+    data = yield from store.read('foo')
+    data['value'] = 'mutated'
+    data = yield from store.read('foo')
+    assert data == {'value': 'bar'}
+    assert stats.hits == 1
+
+    yield from store.write('foo', {'value': 'baz'})
+    data = yield from store.read('foo')
+    assert data == {'value': 'baz'}
+
+    yield from store.delete('foo')
+    with pytest.raises(KeyError):
+        yield from store.read('foo')
+    with pytest.raises(KeyError):
+        yield from store.read('foo')
+    assert stats.hits == 2
+
+
+@async_test
+def test_read_many(dev_server):
+    client = Vault(dev_server.addr, token=dev_server.root_token)
+    store = client.secret.load('secret', type='generic')
+
+    for i in range(5):
+        yield from store.write('many/%s' % i, {'value': i})
+
+    keys = ['many/%s' % i for i in range(6)]
+    values = yield from store.read_many(keys, concurrency=2)
+    assert len(values) == 5
+    assert values['many/3']['value'] == 3
+    assert isinstance(values.errors['many/5'], KeyError)
+
+    values = yield from client.read_many(['/secret/many/0'])
+    assert values['/secret/many/0']['value'] == 0
+
+
+@async_test
+def test_walk(dev_server):
+    client = Vault(dev_server.addr, token=dev_server.root_token)
+    store = client.secret.load('secret', type='generic')
+
+    yield from store.write('tree/foo', {'value': 1})
+    yield from store.write('tree/bar/baz', {'value': 2})
+    keys = yield from store.list('tree')
+    assert sorted(keys) == ['bar/', 'foo']
+
+    walk = store.walk('tree', concurrency=2)
+    found = {}
+    while True:
+        entry = yield from walk.next()
+        if entry is None:
+            break
+        path, keys = entry
+        found[path] = keys
+    assert found['tree/bar/'] == ['baz']
+
+    with pytest.raises(KeyError):
+        yield from store.list('nope')
+
+
+@async_test
+def test_export(dev_server):
+    client = Vault(dev_server.addr, token=dev_server.root_token)
+    store = client.secret.load('secret', type='generic')
+
+    yield from store.write('snap/a', {'value': 1})
+    yield from store.write('snap/b/c', {'value': 2})
+    yield from store.write('snap/d', {'value': 3})
+
+    stream, keys = io.BytesIO(), []
+    count = yield from store.export(stream, 'snap', compress=True,
+                                    checkpoint=keys.append)
+    assert count == 3
+    assert keys == ['snap/a', 'snap/b/c', 'snap/d']
+
+    _, copy = yield from client.secret.mount('snap', type='generic')
+    stream.seek(0)
+    count = yield from copy.import_(stream, compress=True, skip=1)
+    assert count == 2
+    data = yield from copy.read('snap/d')
+    assert data == {'value': 3}
+    with pytest.raises(KeyError):
+        yield from copy.read('snap/a')
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.mark.parametrize('compress', [False, True])
+@async_test
+def test_export_resume(compress):
+    vault = FakeVault()
+    tree = {'snap/': ['a', 'b/', 'd', 'e'], 'snap/b/': ['c']}
+
+    def secret(method, path, token, data):
+        path = path[len('/secret/'):]
+        if path.endswith('/'):
+            return {'data': {'keys': tree[path]}}
+        return {'lease_id': '', 'lease_duration': 0, 'renewable': False,
+                'auth': None, 'data': {'key': path}}
+
+    vault.route('/secret/', secret)
+    client = fake_client(vault)
+    store = client.secret.load('secret', type='generic')
+
+    # the records are buffered, only the flushed ones survive a crash
+    raw = io.BytesIO()
+    saved = []
+
+    def checkpoint(key):
+        saved.append((key, raw.getvalue()))
+        if len(saved) == 2:
+            raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        yield from store.export(io.BufferedWriter(raw), 'snap',
+                                compress=compress, checkpoint=checkpoint)
+    last_key, content = saved[-1]
+    assert last_key == 'snap/b/c'
+
+    def keys(content):
+        reader = Reader(io.BytesIO(content), compress=compress)
+        return [record[0] for record in iter(reader.read, None)]
+
+    assert keys(content) == ['snap/a', 'snap/b/c']
+    if compress:
+        # resumed into a new file
+        stream = io.BytesIO()
+    else:
+        stream = io.BytesIO(content)
+        stream.seek(0, 2)
+    count = yield from store.export(stream, 'snap', compress=compress,
+                                    after=last_key)
+    assert count == 2
+    if compress:
+        assert keys(stream.getvalue()) == ['snap/d', 'snap/e']
+    else:
+        assert keys(stream.getvalue()) == ['snap/a', 'snap/b/c',
+                                           'snap/d', 'snap/e']
+    client.close()
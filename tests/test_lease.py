@@ -1,5 +1,9 @@
+import asyncio
 from aiovault import Vault
-from conftest import async_test
+from aiovault.exceptions import HTTPError
+from aiovault.v1.lease import LeaseManager
+from aiovault.v1 import LeaseEndpoint
+from conftest import FakeHandler, FakeVault, async_test
 
 
 @async_test
@@ -28,3 +32,68 @@ def test_revoke_prefix(dev_server):
     client = Vault(dev_server.addr, token=dev_server.root_token)
     revoked = yield from client.lease.revoke_prefix('foo/1234')
     assert revoked
+
+
+def lease_endpoint(failures=()):
+    """Returns a lease endpoint, that fails to renew some leases"""
+    vault = FakeVault()
+
+    def renew(method, path, token, data):
+        lease_id = path.split('/')[-1]
+        if lease_id in failures:
+            raise HTTPError({'errors': ['lease not found']}, 400)
+        return {'lease_id': lease_id, 'lease_duration': 1,
+                'renewable': True, 'auth': None, 'data': {}}
+
+    vault.route('/sys/renew/', renew)
+    vault.route('/sys/revoke/', lambda *args: None)
+    return LeaseEndpoint(FakeHandler(vault)), vault
+
+
+@async_test
+def test_manager():
+    endpoint, vault = lease_endpoint(failures=['bar'])
+    failed, expired = [], []
+    manager = LeaseManager(endpoint, fraction=0.1, retry=0.05,
+                           on_failure=lambda lease, error: failed.append(
+                               lease.lease_id),
+                           on_expire=lambda lease: expired.append(
+                               lease.lease_id))
+    manager.register('foo', duration=1, renewable=True)
+    manager.register('bar', duration=0.3, renewable=True)
+    manager.register('baz', duration=0.2, renewable=False)
+
+    yield from asyncio.sleep(0.5)
+    assert manager.leases['foo'].renewals >= 3
+    assert 'bar' in failed
+    assert expired == ['baz', 'bar']
+
+    results = yield from manager.close()
+    assert list(results) == ['foo']
+    assert ('PUT', '/sys/revoke/foo') in vault.requests
+    endpoint.req_handler.close()
+
+
+@async_test
+def test_faulty_callback():
+    endpoint, vault = lease_endpoint()
+    renewals = []
+
+    def on_renew(lease):
+        renewals.append(lease.renewals)
+        raise RuntimeError('boom')
+
+    @asyncio.coroutine
+    def on_expire(lease):
+        raise RuntimeError('boom')
+
+    manager = LeaseManager(endpoint, fraction=0.1, on_renew=on_renew,
+                           on_expire=on_expire)
+    manager.register('foo', duration=1, renewable=True)
+    manager.register('bar', duration=0.05, renewable=False)
+
+    yield from asyncio.sleep(0.3)
+    assert renewals[:2] == [1, 2]
+    assert list(manager.leases) == ['foo']
+    yield from manager.close(revoke=False)
+    endpoint.req_handler.close()
@@ -0,0 +1,51 @@
+import asyncio
+from aiovault import Limiter
+from aiovault.limiter import TokenBucket
+from conftest import async_test
+
+
+@async_test
+def test_concurrency():
+    limiter = Limiter(concurrency=2)
+    running, peak = 0, 0
+
+    @asyncio.coroutine
+    def request():
+        nonlocal running, peak
+        with (yield from limiter.acquire('/secret/foo')):
+            running += 1
+            peak = max(peak, running)
+            yield from asyncio.sleep(0.01)
+            running -= 1
+
+    yield from asyncio.gather(*[request() for i in range(6)])
+    assert peak == 2
+    assert limiter.stats.requests == 6
+    assert limiter.stats.waiting == 0
+    assert limiter.stats.max_wait > 0
+
+
+@async_test
+def test_prefixes():
+    transit = Limiter(concurrency=1)
+    limiter = Limiter(concurrency=10, prefixes={'/transit/': transit})
+
+    slot = yield from limiter.acquire('/transit/encrypt/foo')
+    assert transit.semaphore.locked()
+    slot.release()
+    assert not transit.semaphore.locked()
+
+    slot = yield from limiter.acquire('/secret/foo')
+    assert transit.stats.requests == 1
+    assert limiter.stats.requests == 2
+    slot.release()
+
+
+@async_test
+def test_rate():
+    bucket = TokenBucket(rate=100, burst=1)
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    for i in range(5):
+        yield from bucket.take()
+    assert loop.time() - started >= 0.035
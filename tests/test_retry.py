@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from aiovault import RetryPolicy
+from aiovault.exceptions import DownError, InvalidPath, RateLimitExceeded
+from aiovault.exceptions import RequestTimeout
+from aiovault.request import retry_after
+from aiohttp import ServerDisconnectedError
+from conftest import FakeVault, async_test, fake_client
+
+
+def error(cls, status, retry_after=None):
+    obj = cls({'errors': []})
+    obj.status = status
+    obj.retry_after = retry_after
+    return obj
+
+
+def test_idempotent_methods():
+    policy = RetryPolicy(attempts=3)
+    down = error(DownError, 503)
+
+    assert policy.delay('GET', 1, down) is not None
+    assert policy.delay('DELETE', 1, down) is not None
+    assert policy.delay('PUT', 1, down) is None
+    assert policy.delay('PUT', 1, down, idempotent=True) is not None
+    assert policy.delay('GET', 1, down, idempotent=False) is None
+
+
+def test_retried_errors():
+    policy = RetryPolicy(attempts=3)
+
+    assert policy.delay('GET', 1, error(InvalidPath, 404)) is None
+    assert policy.delay('GET', 1, ServerDisconnectedError()) is not None
+    assert policy.delay('GET', 1, ValueError()) is None
+
+
+def test_attempts():
+    policy = RetryPolicy(attempts=3)
+    down = error(DownError, 503)
+
+    assert policy.delay('GET', 2, down) is not None
+    assert policy.delay('GET', 3, down) is None
+
+
+def test_backoff():
+    policy = RetryPolicy(attempts=10, backoff=1, max_backoff=4)
+    down = error(DownError, 503)
+
+    for attempt in range(1, 10):
+        delay = policy.delay('GET', attempt, down)
+        assert 0 <= delay <= min(4, 2 ** (attempt - 1))
+
+
+def test_retry_after():
+    policy = RetryPolicy(attempts=3, backoff=0.01)
+    limited = error(RateLimitExceeded, 429, retry_after=2)
+    assert policy.delay('GET', 1, limited) == 2
+
+    policy = RetryPolicy(attempts=3, backoff=0.01, retry_after=False)
+    assert policy.delay('GET', 1, limited) <= 0.01
+
+    assert retry_after('3') == 3
+    assert retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert retry_after('garbage') is None
+    assert retry_after(None) is None
+
+
+def test_deadline():
+    policy = RetryPolicy(attempts=3, deadline=5)
+    limited = error(RateLimitExceeded, 429, retry_after=2)
+
+    assert policy.delay('GET', 1, limited, elapsed=1) == 2
+    assert policy.delay('GET', 1, limited, elapsed=4) is None
+
+
+@async_test
+def test_deadline_bounds_attempt():
+    vault = FakeVault()
+
+    @asyncio.coroutine
+    def slow(method, path, token, data):
+        yield from asyncio.sleep(1)
+        return {}
+
+    vault.route('/secret/', slow)
+    client = fake_client(vault, retry=RetryPolicy(deadline=0.05))
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    with pytest.raises(RequestTimeout):
+        yield from client.read('/secret/foo')
+    assert loop.time() - started < 0.5
+    client.close()
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from aiovault.exceptions import DownError
+from aiovault.routing import Router
+from conftest import FakeVault, async_test
+
+NODES = ['http://node1:8200', 'http://node2:8200', 'http://node3:8200']
+
+
+@async_test
+def test_leader():
+    cluster = FakeVault(NODES, leader='http://node2:8200',
+                        down=['http://node1:8200'])
+    router = Router(NODES)
+
+    addr = yield from router.route('POST', cluster.fetch_leader)
+    assert addr == 'http://node2:8200'
+    assert cluster.leader_calls == ['http://node1:8200', 'http://node2:8200']
+
+    addr = yield from router.route('GET', cluster.fetch_leader)
+    assert addr == 'http://node2:8200'
+    assert len(cluster.leader_calls) == 2, 'leader must be cached'
+
+
+@async_test
+def test_concurrent_discovery():
+    cluster = FakeVault(NODES, leader='http://node1:8200')
+    router = Router(NODES)
+
+    addrs = yield from asyncio.gather(*[
+        router.route('POST', cluster.fetch_leader) for i in range(10)
+    ])
+    assert set(addrs) == {'http://node1:8200'}
+    assert len(cluster.leader_calls) == 1
+
+
+@async_test
+def test_invalidate():
+    cluster = FakeVault(NODES, leader='http://node1:8200')
+    router = Router(NODES)
+
+    addr = yield from router.route('POST', cluster.fetch_leader)
+    assert addr == 'http://node1:8200'
+
+    router.invalidate('http://node3:8200')
+    addr = yield from router.route('POST', cluster.fetch_leader)
+    assert len(cluster.leader_calls) == 1
+
+    cluster.leader = 'http://node3:8200'
+    router.invalidate('http://node1:8200')
+    addr = yield from router.route('POST', cluster.fetch_leader)
+    assert addr == 'http://node3:8200'
+    assert len(cluster.leader_calls) == 2
+
+
+@async_test
+def test_standby_reads():
+    cluster = FakeVault(NODES, leader='http://node1:8200')
+    router = Router(NODES, standby_reads=True)
+
+    reads = set()
+    for i in range(4):
+        addr = yield from router.route('GET', cluster.fetch_leader)
+        reads.add(addr)
+    assert reads == {'http://node2:8200', 'http://node3:8200'}
+
+    addr = yield from router.route('DELETE', cluster.fetch_leader)
+    assert addr == 'http://node1:8200'
+
+
+@async_test
+def test_all_down():
+    cluster = FakeVault(NODES, down=NODES)
+    router = Router(NODES)
+
+    with pytest.raises(DownError) as excinfo:
+        yield from router.route('GET', cluster.fetch_leader)
+    assert len(excinfo.value.errors) == len(NODES)
+
+
+def test_no_node():
+    with pytest.raises(DownError):
+        Router([])
@@ -0,0 +1,21 @@
+import io
+import pytest
+from aiovault.snapshot import Reader, Writer
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_roundtrip(compress):
+    stream = io.BytesIO()
+    with Writer(stream, compress=compress) as writer:
+        writer.write('foo', {'value': 1})
+        writer.write('bar/baz', {'value': 'é'})
+
+    stream.seek(0)
+    reader = Reader(stream, compress=compress)
+    assert reader.read() == ('foo', {'value': 1})
+    assert reader.read() == ('bar/baz', {'value': 'é'})
+    assert reader.read() is None
+
+    stream.seek(0)
+    reader = Reader(stream, compress=compress, skip=1)
+    assert reader.read() == ('bar/baz', {'value': 'é'})
@@ -0,0 +1,78 @@
+import asyncio
+from aiovault.sync import digests, sync
+from conftest import async_test
+
+
+class Store:
+    """Mimics a generic backend"""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    @asyncio.coroutine
+    def list(self, prefix):
+        self.calls.append(('list', prefix))
+        keys = set()
+        for key in self.data:
+            if key.startswith(prefix):
+                rest = key[len(prefix):]
+                keys.add(rest.split('/')[0] + '/' if '/' in rest else rest)
+        if not keys:
+            raise KeyError(prefix)
+        return sorted(keys)
+
+    @asyncio.coroutine
+    def fetch(self, key, *, cached=True):
+        self.calls.append(('read', key))
+        return {'data': dict(self.data[key])}
+
+    @asyncio.coroutine
+    def write(self, key, values):
+        self.calls.append(('write', key))
+        self.data[key] = dict(values)
+
+    @asyncio.coroutine
+    def delete(self, key):
+        self.calls.append(('delete', key))
+        self.data.pop(key, None)
+
+
+def test_digests():
+    hashes = digests({'a/b': {'v': 1}, 'a/c/d': {'v': 2}, 'e': {'v': 3}})
+    assert set(hashes) == {'', 'a/', 'a/c/', 'a/b', 'a/c/d', 'e'}
+    other = digests({'a/b': {'v': 1}, 'a/c/d': {'v': 4}, 'e': {'v': 3}})
+    assert hashes['a/b'] == other['a/b']
+    assert hashes['a/'] != other['a/']
+
+
+@async_test
+def test_sync():
+    store = Store({'app/a': {'v': 1},
+                   'app/b': {'v': 2},
+                   'app/old': {'v': 0},
+                   'app/db/user': {'v': 'x'}})
+    desired = {'app/a': {'v': 1},
+               'app/b': {'v': 3},
+               'app/c': {'v': 4},
+               'app/db/user': {'v': 'x'}}
+
+    report = yield from sync(store, desired, 'app', dry_run=True)
+    assert report.creates == ['app/c']
+    assert report.updates == ['app/b']
+    assert report.deletes == ['app/old']
+    assert report.unchanged == 2
+    assert 'app/c' not in store.data
+
+    report = yield from sync(store, desired, 'app')
+    assert report.changes == 3
+    assert not report.errors
+    assert store.data == desired
+
+    store.calls[:] = []
+    desired['app/a'] = {'v': 5}
+    report = yield from sync(store, desired, 'app', state=report.state)
+    assert report.updates == ['app/a']
+    assert report.skipped == ['app/db/']
+    assert ('list', 'app/db/') not in store.calls
+    assert ('read', 'app/b') not in store.calls
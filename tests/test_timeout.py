@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from aiovault import RequestTimeout, Timeout
+from aiovault.util import task, with_timeout
+from conftest import FakeVault, async_test, fake_client
+
+
+@task
+def slow(delay):
+    yield from asyncio.sleep(delay)
+    return delay
+
+
+def test_coerce():
+    assert Timeout.coerce(None).total is None
+    assert Timeout.coerce(3).total == 3
+    timeout = Timeout(3, read=1)
+    assert Timeout.coerce(timeout) is timeout
+
+
+@async_test
+def test_with_timeout():
+    result = yield from with_timeout(slow(0), 1)
+    assert result == 0
+
+    with pytest.raises(RequestTimeout):
+        yield from with_timeout(slow(1), 0.01)
+
+    loop = asyncio.get_event_loop()
+    with pytest.raises(RequestTimeout):
+        yield from with_timeout(slow(1), deadline=loop.time() + 0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        yield from with_timeout(slow(1), Timeout(0.01))
+
+
+@async_test
+def test_task_timeout():
+    result = yield from slow(0, timeout=1)
+    assert result == 0
+
+    with pytest.raises(RequestTimeout):
+        yield from slow(1, timeout=0.01)
+
+
+@async_test
+def test_call_timeout():
+    vault = FakeVault()
+
+    @asyncio.coroutine
+    def slow(method, path, token, data):
+        yield from asyncio.sleep(1)
+        return {}
+
+    vault.route('/secret/', slow)
+    client = fake_client(vault, timeout=Timeout(read=5))
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    with pytest.raises(RequestTimeout):
+        yield from client.read('/secret/foo', timeout=Timeout(10, read=.05))
+    assert loop.time() - started < 0.5
+
+    handler = client.req_handler.bounded(3, loop.time() + 1)
+    assert handler.call_timeout.total == 3
+    assert handler.call_timeout.read == 5
+    assert handler.deadline <= loop.time() + 1
+    assert client.req_handler.deadline is None
+    client.close()
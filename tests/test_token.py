@@ -1,5 +1,10 @@
+import asyncio
+import time
+from collections import OrderedDict
 from aiovault import Vault
-from conftest import async_test
+from aiovault.cache import LRUCache
+from aiovault.exceptions import BadToken
+from conftest import FakeVault, async_test, fake_client
 import pytest
 
 
@@ -84,3 +89,228 @@ def test_revoke_orphan(dev_server):
     with pytest.raises(KeyError):
         yield from client.auth.lookup(parent_token)
     yield from client.auth.lookup(child_token)
+
+
+@async_test
+def test_using(dev_server):
+    client = Vault(dev_server.addr, token=dev_server.root_token)
+
+    token = yield from client.auth.create()
+    other = client.using(token)
+    assert other.req_handler.session is client.req_handler.session
+
+    current = yield from other.auth.lookup_self()
+    assert current.id == token.id
+    current = yield from client.auth.lookup_self()
+    assert current.id == dev_server.root_token
+
+    response = yield from client.read('/auth/token/lookup-self',
+                                      token=token)
+    result = yield from response.json()
+    assert result['data']['id'] == token.id
+
+
+def token_vault():
+    """Returns a fake vault, with tokens that can be revoked"""
+    vault = FakeVault()
+    vault.valid = set()
+    vault.renewable = True
+    vault.duration = 1
+    vault.logins = vault.renewals = vault.lookups = 0
+
+    def auth(token):
+        return {'auth': {'client_token': token,
+                         'lease_duration': vault.duration,
+                         'renewable': vault.renewable},
+                'data': None, 'lease_duration': 0, 'lease_id': '',
+                'renewable': False}
+
+    def check(token):
+        if token not in vault.valid:
+            raise BadToken({'errors': ['permission denied']})
+
+    @asyncio.coroutine
+    def create(method, path, token, data):
+        yield from asyncio.sleep(.01 * data.get('num_uses', 0))
+        if data.get('display_name') == 'bad':
+            raise BadToken({'errors': ['permission denied']})
+        return auth(data['display_name'])
+
+    @asyncio.coroutine
+    def login(method, path, token, data):
+        yield from asyncio.sleep(.05)
+        vault.logins += 1
+        token = 'token-%s' % vault.logins
+        vault.valid.add(token)
+        return auth(token)
+
+    def renew(method, path, token, data):
+        check(token)
+        if not vault.renewable:
+            raise BadToken({'errors': ['token not renewable']})
+        vault.renewals += 1
+        return auth(token)
+
+    def lookup(method, path, token, data):
+        check(token)
+        vault.lookups += 1
+        if '/lookup/' in path:
+            token = path.split('/')[-1]
+        return {'auth': None, 'data': {'id': token, 'ttl': 60},
+                'lease_duration': 0, 'lease_id': '', 'renewable': False}
+
+    def revoke(method, path, token, data):
+        check(token)
+
+    def read(method, path, token, data):
+        check(token)
+        if path == '/secret/denied':
+            raise BadToken({'errors': ['permission denied']})
+        return {'data': {'id': token}}
+
+    vault.route('/auth/token/create', create)
+    vault.route('/auth/userpass/login/', login)
+    vault.route('/auth/token/renew/', renew)
+    vault.route('/auth/token/lookup', lookup)
+    vault.route('/auth/token/revoke', revoke)
+    vault.route('/secret/', read)
+    return vault
+
+
+@async_test
+def test_manager():
+    server = token_vault()
+    client = fake_client(server)
+    handler = client.req_handler
+    manager = client.manage_token(login={'name': 'userpass',
+                                         'username': 'bob',
+                                         'password': 'secret'},
+                                  fraction=.5, jitter=0, retry=.1)
+    token = yield from manager.start()
+    assert token.id == 'token-1'
+    assert handler.token == 'token-1'
+
+    # the token is revoked, a single login serves all the requests
+    server.valid.clear()
+    responses = yield from asyncio.gather(*[
+        client.read('/secret/foo') for _ in range(5)])
+    assert [r.data['data']['id'] for r in responses] == ['token-2'] * 5
+    assert server.logins == 2
+
+    # a valid token that lacks a policy is kept
+    with pytest.raises(BadToken):
+        yield from client.read('/secret/denied')
+    assert server.logins == 2
+
+    yield from asyncio.sleep(.7)
+    assert server.renewals == 1
+    assert handler.token == 'token-2'
+
+    # a token that cannot be renewed is replaced
+    server.renewable = False
+    yield from asyncio.sleep(.6)
+    assert server.logins == 3
+    assert handler.token == 'token-3'
+
+    manager.close()
+    assert handler.token_manager is None
+    client.close()
+
+
+@async_test
+def test_manager_timeout():
+    server = token_vault()
+    client = fake_client(server)
+    handler = client.req_handler
+    manager = client.manage_token(login={'name': 'userpass',
+                                         'username': 'bob',
+                                         'password': 'secret'},
+                                  jitter=0, retry=.1)
+    yield from manager.start()
+
+    # bounded requests send the current token, not the one of their copy
+    server.valid.clear()
+    responses = yield from asyncio.gather(*[
+        client.read('/secret/foo', timeout=5) for _ in range(3)])
+    assert [r.data['data']['id'] for r in responses] == ['token-2'] * 3
+    assert handler.token == 'token-2'
+    response = yield from client.read('/secret/foo', timeout=5)
+    assert response.data['data']['id'] == 'token-2'
+    assert server.logins == 2
+
+    manager.close()
+    client.close()
+
+
+@async_test
+def test_manager_short_ttl():
+    server = token_vault()
+    client = fake_client(server)
+    handler = client.req_handler
+    manager = client.manage_token(login={'name': 'userpass',
+                                         'username': 'bob',
+                                         'password': 'secret'},
+                                  fraction=.2, jitter=0, retry=5)
+    yield from manager.start()
+    server.duration = .5
+    yield from asyncio.sleep(.3)
+    assert server.renewals == 1
+    assert server.logins == 2, 'renewed for less, near its max ttl'
+
+    # a token shorter than the retry interval is still renewed
+    yield from asyncio.sleep(.35)
+    assert server.renewals >= 3
+    assert server.logins == 2
+    assert handler.token == 'token-2'
+    manager.close()
+    client.close()
+
+
+@async_test
+def test_lookup_cache():
+    server = token_vault()
+    server.valid.update(['root', 'foo', 'bar'])
+    cache = LRUCache(ttl=300)
+    client = fake_client(server, lookup_cache=cache)
+    client.req_handler.token = 'root'
+
+    for _ in range(3):
+        token = yield from client.auth.lookup('foo')
+        assert token.id == 'foo'
+    token = yield from client.auth.lookup_self()
+    assert token.id == 'root'
+    assert server.lookups == 2
+    yield from client.auth.lookup('foo', cached=False)
+    assert server.lookups == 3
+
+    # entries expire with the token, or with the cache ttl
+    assert ('foo', 'root') in cache
+    assert cache._entries['foo', 'root'][1] - time.monotonic() <= 60
+
+    yield from client.auth.lookup('bar')
+    yield from client.auth.revoke_orphan('foo')
+    assert ('foo', 'root') not in cache
+    assert ('bar', 'root') in cache
+    yield from client.auth.revoke('bar')
+    assert len(cache) == 0
+
+    yield from client.auth.lookup('foo')
+    client.auth.forget('foo')
+    assert len(cache) == 0
+    client.close()
+
+
+@async_test
+def test_create_many():
+    client = fake_client(token_vault())
+    # the first tokens are the slowest to create
+    specs = ({'display_name': name, 'num_uses': 5 - i}
+             for i, name in enumerate(['a', 'b', 'bad', 'c', 'd']))
+
+    tokens = yield from client.auth.create_many(specs, concurrency=3)
+    assert isinstance(tokens, OrderedDict)
+    assert list(tokens) == [0, 1, 3, 4]
+    assert [token.id for token in tokens.values()] == ['a', 'b', 'c', 'd']
+    assert list(tokens.errors) == [2]
+    assert isinstance(tokens.errors[2], BadToken)
+    client.close()
@@ -1,4 +1,4 @@
-from aiovault import Vault
+from aiovault import PlaintextCache, Vault
 from conftest import async_test
 import pytest
 
@@ -132,3 +132,53 @@ def test_shortcut(dev_server):
     #
     # with pytest.raises(KeyError):
     #     yield from backend.read_key('test')
+
+
+@async_test
+def test_many(dev_server):
+    client = Vault(dev_server.addr, token=dev_server.root_token)
+    mounted, backend = yield from client.secret.mount('transit')
+    yield from backend.write_key('test', derived=False)
+
+    plaintexts = ['plain-%s' % i for i in range(20)]
+    ciphertexts = yield from backend.encrypt_many('test', plaintexts,
+                                                  concurrency=4)
+    assert len(ciphertexts) == 20
+    decrypted = yield from backend.decrypt_many('test', ciphertexts,
+                                                concurrency=4)
+    assert decrypted == plaintexts
+
+    with pytest.raises(ValueError):
+        yield from backend.decrypt_many('test', ['not-a-ciphertext'])
+
+
+@async_test
+def test_binary(dev_server):
+    client = Vault(dev_server.addr, token=dev_server.root_token)
+    mounted, backend = yield from client.secret.mount('transit')
+    yield from backend.write_key('test', derived=False)
+
+    blob = bytes(range(256)) * 1024
+    encrypted = yield from backend.encrypt('test', memoryview(blob))
+    decrypted = yield from backend.decrypt('test', encrypted['ciphertext'],
+                                           binary=True)
+    assert decrypted['plaintext'] == blob
+
+
+@async_test
+def test_decrypt_cache(dev_server):
+    cache = PlaintextCache(keys=['test'])
+    client = Vault(dev_server.addr, token=dev_server.root_token,
+                   decrypt_cache=cache)
+    mounted, backend = yield from client.secret.mount('transit')
+    yield from backend.write_key('test', derived=False)
+
+    encrypted = yield from backend.encrypt('test', PLAIN_TEXT)
+    for i in range(3):
+        decrypted = yield from backend.decrypt('test',
+                                               encrypted['ciphertext'])
+        assert decrypted['plaintext'] == PLAIN_TEXT
+    assert cache.stats.hits == 2
+
+    yield from backend.delete_key('test')
+    assert len(cache) == 0